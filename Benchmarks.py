@@ -0,0 +1,128 @@
+import time
+import gzip
+import argparse
+import pandas as pd
+import plotly.io as pio
+from fpdf import FPDF
+import main
+import Database
+import Functions
+
+# brotli is only needed to measure the brotli compressed sizes
+try:
+    import brotli
+    brotli_available = True
+except ImportError:
+    brotli_available = False
+
+
+# this function returns the best time ( in milliseconds ) of calling func repeat times and its last result
+def measure(func, repeat):
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+# the callbacks measured , every one is called with the filters of a customer ( customer , bank , sector , year )
+def get_callbacks_cases(filters):
+    customer, bank, sector, year = filters
+    table_filters = dict(customer=customer, bank=bank, sector=sector, year=year)
+    return [
+        ('update_all_cards', lambda: main.update_all_cards(1, customer, bank, sector, year, 'Sum Monthly')),
+        ('update_table_page', lambda: main.update_table_page(0, 4, [], '', table_filters)),
+        ('update_line_figure', lambda: main.update_line_figure('Sum Daily', customer, bank, sector, year)),
+        ('update_hist_zoom', lambda: main.update_hist_zoom({'xaxis.autorange': True}, table_filters)),
+        ('update_customer_options', lambda: main.update_customer_options(str(customer)[:3], customer)),
+    ]
+
+
+# this function measures the payload bytes and the encoding time of the callbacks responses with every json engine ,
+# the compressed sizes are the ones sent when response_compression is on
+def benchmark_callbacks(customers_count=5, repeat=5):
+    dataset = Database.get_dataset()
+    customers = dataset.customers_ids[:customers_count]
+    engines = ['json'] + (['orjson'] if main.orjson_available else [])
+
+    rows = []
+    for patch_updates in [False, True]:
+        main.figure_patch_updates = patch_updates
+        totals = {}
+        for customer in customers:
+            for name, callback in get_callbacks_cases((customer, 'All Banks', 'All Sectors', 'All Years')):
+                build_ms, result = measure(callback, repeat)
+                total = totals.setdefault(name, dict(build_ms=0, bytes=0, gzip=0, br=0))
+                total['build_ms'] += build_ms
+                for engine in engines:
+                    encode_ms, payload = measure(lambda: pio.json.to_json_plotly(result, engine=engine), repeat)
+                    total[engine + '_ms'] = total.get(engine + '_ms', 0) + encode_ms
+                payload = payload.encode('utf-8')
+                total['bytes'] += len(payload)
+                total['gzip'] += len(gzip.compress(payload, 6))
+                if brotli_available:
+                    total['br'] += len(brotli.compress(payload, quality=4))
+
+        for name, total in totals.items():
+            rows.append(['patch' if patch_updates else 'full', name] +
+                        [round(total[key] / len(customers), 2) for key in
+                         ['build_ms'] + [engine + '_ms' for engine in engines] + ['bytes', 'gzip', 'br']])
+
+    header = ['figures', 'callback', 'build ms'] + [engine + ' ms' for engine in engines] + ['bytes', 'gzip bytes', 'br bytes']
+    return header, rows
+
+
+# the table of the pdf report drawn like before , one fpdf cell per value of the rows taken with iterrows ,
+# only used to compare it with Functions.generate_pdf_report
+def generate_pdf_table_cells(df_customer, pdf):
+    pdf.add_page()
+    pdf.set_font('Times', '', 8.0)
+    col_width = (pdf.w - pdf.l_margin) / 7
+    th = pdf.font_size
+    data = [list(df_customer.columns)] + [row.to_list() for index, row in df_customer.iterrows()]
+    for row in data:
+        for datum in row:
+            pdf.cell(col_width, 2 * th, str(datum), border=1, align='C')
+        pdf.ln(2 * th)
+    return pdf.output(dest='S').encode('latin-1')
+
+
+# this function measures the pdf report of a customer with rows_count operations , made by repeating the rows of the
+# customer with the most operations
+def benchmark_pdf(rows_count=50000):
+    dataset = Database.get_dataset()
+    rows_counts = dataset.get_operations_counts()
+    biggest_customer = max(rows_counts, key=rows_counts.get)
+    df_customer = Functions.get_table_frame(dataset.get_customer_rows(biggest_customer))
+    df_customer = pd.concat([df_customer] * (rows_count // len(df_customer) + 1)).iloc[:rows_count].reset_index(drop=True)
+
+    rows = []
+    cells_ms, content = measure(lambda: generate_pdf_table_cells(df_customer, FPDF(format='letter', unit='in')), 1)
+    rows.append(['one cell per value', rows_count, round(cells_ms), len(content)])
+    report_ms, content = measure(lambda: Functions.generate_pdf_report(
+        df_customer, FPDF(format='letter', unit='in'), 'Customer', biggest_customer, '', '', '', '', '', '', ''), 1)
+    rows.append(['generate_pdf_report', rows_count, round(report_ms), len(content)])
+    return ['renderer', 'rows', 'ms', 'bytes'], rows
+
+
+# printing the rows under the header in aligned columns
+def print_table(header, rows):
+    widths = [max(len(str(row[i])) for row in [header] + rows) for i in range(len(header))]
+    for row in [header] + rows:
+        print('  '.join(str(value).rjust(width) for value, width in zip(row, widths)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measures the dashboard callbacks responses ( averages per customer )')
+    parser.add_argument('--customers', type=int, default=5, help='number of customers measured')
+    parser.add_argument('--repeat', type=int, default=5, help='calls of every measure , the best time is kept')
+    parser.add_argument('--pdf-rows', type=int, default=50000, help='operations of the customer of the pdf report')
+    args = parser.parse_args()
+
+    print('callbacks payloads')
+    print_table(*benchmark_callbacks(args.customers, args.repeat))
+    print()
+    print('pdf report')
+    print_table(*benchmark_pdf(args.pdf_rows))
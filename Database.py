@@ -0,0 +1,985 @@
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+import time
+import tempfile
+from bisect import bisect_left
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import Functions
+
+# pyarrow is needed to write the columnar snapshot , without it we just read the excel file every time
+try:
+    import pyarrow
+    import pyarrow.dataset
+    import pyarrow.parquet
+    snapshot_available = True
+except ImportError:
+    snapshot_available = False
+
+# xlsxwriter is needed to write the excel exports row by row , without it the whole export is written with pandas
+try:
+    import xlsxwriter
+    xlsxwriter_available = True
+except ImportError:
+    xlsxwriter_available = False
+
+# the columns we are interested in from the database sheet
+data_columns = ['ide', 'bank_name', 'customer_id', 'customer_name', 'transaction_value', 'deposited_value', 'to_be_paid',
+                'approval_date', 'sector_name4', 'rate_JUCAS', 'rate_bank', 'time_amortization']
+
+# the string columns with few different values , they are stored as categoricals to save memory
+categorical_columns = ['bank_name', 'sector_name4', 'customer_name', 'customer_id']
+
+# the numeric columns that are stored in the smallest type keeping all their values
+downcast_columns = ['transaction_value', 'deposited_value', 'to_be_paid', 'rate_JUCAS', 'rate_bank', 'time_amortization']
+
+# the dropdowns values that match everything
+all_banks = 'All Banks'
+all_sectors = 'All Sectors'
+all_years = 'All Years'
+
+# increase this number whenever prepare_dataframe ( or the way the snapshot is written ) changes so the old snapshots are rebuilt
+snapshot_version = 6
+
+# the rows of one row group of the raw snapshot , it is sorted by customer_id so reading the rows of one customer
+# only decodes the row groups that can have them
+raw_row_group_size = 1000
+
+
+# this function stores a numeric column in the smallest type that keeps all its values
+def downcast_column(column):
+    if pd.api.types.is_integer_dtype(column):
+        return pd.to_numeric(column, downcast='integer')
+
+    # float32 keeps about 7 significant digits , so it is only used when no value changes ( the ratings for example )
+    values = column.to_numpy(dtype='float64')
+    small_values = values.astype('float32')
+    if np.allclose(small_values, values, rtol=0, atol=1e-6, equal_nan=True):
+        return pd.Series(small_values, index=column.index, name=column.name)
+    return column
+
+
+# this function prepares the dataframe used by the dashboard from the raw excel sheet
+def prepare_dataframe(dff):
+    # taking only the columns we are interested in to reduce processing time
+    df = dff[data_columns].copy()
+
+    # converting the type of customer_id column to string to be easier to work with
+    df['customer_id'] = df['customer_id'].astype(str)
+
+    # converting the type of approval_date column to datetime to be able to use pandas datetime special functions
+    df['approval_date'] = pd.to_datetime(df['approval_date'], format="%d/%m/%Y")
+
+    # creating a new column which contain only years from approval_date column
+    # ( nullable , an empty approval date has no year )
+    df['Year'] = df['approval_date'].dt.year.astype('Int16')
+
+    # the compact storage of the repeated strings and of the numbers
+    for column in categorical_columns:
+        df[column] = df[column].astype('category')
+    for column in downcast_columns:
+        df[column] = downcast_column(df[column])
+
+    # keeping the rows of every customer next to each other ( stable sort so each customer keeps its rows order )
+    df = df.sort_values('customer_id', kind='stable')
+
+    return df
+
+
+# this function returns the sha256 hash of the file content , reading it in chunks
+def get_file_hash(file_path, chunk_size=1024 * 1024):
+    file_hash = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+# the snapshot folder lives next to the excel file ( databse.xlsx -> databse_snapshot )
+def get_snapshot_folder(excel_file):
+    return os.path.splitext(excel_file)[0] + '_snapshot'
+
+
+def read_snapshot_meta(folder):
+    try:
+        with open(os.path.join(folder, 'meta.json')) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if meta.get('snapshot_version') != snapshot_version:
+        return None
+    return meta
+
+
+# every file is written to a temporary name first then renamed , so a worker never reads a half written snapshot
+def write_snapshot_meta(folder, meta):
+    tmp_file = os.path.join(folder, 'meta.json.{}.tmp'.format(os.getpid()))
+    with open(tmp_file, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp_file, os.path.join(folder, 'meta.json'))
+
+
+def write_snapshot(folder, dff, df, meta):
+    os.makedirs(folder, exist_ok=True)
+    # the raw rows of every customer are kept next to each other ( stable sort so each customer keeps its rows order )
+    dff = dff.sort_values('customer_id', kind='stable')
+    for name, frame, row_group_size in (('raw', dff, raw_row_group_size), ('data', df, None)):
+        tmp_file = os.path.join(folder, '{}.parquet.{}.tmp'.format(name, os.getpid()))
+        frame.to_parquet(tmp_file, index=True, row_group_size=row_group_size)
+        os.replace(tmp_file, os.path.join(folder, '{}.parquet'.format(name)))
+
+    # the meta file is written last , it is what marks the snapshot as valid
+    write_snapshot_meta(folder, meta)
+
+
+def read_snapshot(folder):
+    return pd.read_parquet(os.path.join(folder, 'data.parquet'))
+
+
+# this function returns the prepared dataframe , it loads it from the columnar snapshot when the excel file did not change
+# since the snapshot was built , otherwise it reads the excel file and rebuilds the snapshot .
+# the raw sheet is not kept in memory , get_customer_raw_rows reads the rows of one customer when they are needed
+def load_database(excel_file):
+    if not snapshot_available:
+        return prepare_dataframe(pd.read_excel(excel_file, sheet_name='data', engine='openpyxl'))
+
+    folder = get_snapshot_folder(excel_file)
+    stat = os.stat(excel_file)
+    meta = read_snapshot_meta(folder)
+
+    if meta is not None:
+        # same modification time and size , no need to read the excel file at all
+        if meta['mtime'] == stat.st_mtime_ns and meta['size'] == stat.st_size:
+            try:
+                return read_snapshot(folder)
+            except (OSError, ValueError):
+                pass
+
+        # the file was touched , only rebuild if its content really changed
+        file_hash = get_file_hash(excel_file)
+        if meta['hash'] == file_hash:
+            try:
+                df = read_snapshot(folder)
+            except (OSError, ValueError):
+                pass
+            else:
+                meta.update(mtime=stat.st_mtime_ns, size=stat.st_size)
+                try:
+                    write_snapshot_meta(folder, meta)
+                except OSError:
+                    pass
+                return df
+    else:
+        file_hash = get_file_hash(excel_file)
+
+    # reading the database into a dataframe
+    dff = pd.read_excel(excel_file, sheet_name='data', engine='openpyxl')
+    df = prepare_dataframe(dff)
+
+    meta = dict(snapshot_version=snapshot_version, mtime=stat.st_mtime_ns, size=stat.st_size, hash=file_hash)
+    try:
+        write_snapshot(folder, dff, df, meta)
+    except OSError:
+        # the app can still run without a snapshot ( read only folder for example )
+        pass
+
+    return df
+
+
+# this function returns the original rows ( with all the excel columns ) of one customer ,
+# only these rows are read from the raw snapshot
+def get_customer_raw_rows(excel_file, customer_id):
+    raw_file = os.path.join(get_snapshot_folder(excel_file), 'raw.parquet')
+    if snapshot_available and os.path.exists(raw_file):
+        return pd.read_parquet(raw_file, filters=[('customer_id', '==', int(customer_id))])
+
+    dff = pd.read_excel(excel_file, sheet_name='data', engine='openpyxl')
+    return dff[dff['customer_id'] == int(customer_id)]
+
+
+# the rows of one customer as they are exported to excel , the customer id is written as a text so excel keeps all its digits
+def get_customer_export_rows(excel_file, customer_id):
+    df_customer = get_customer_raw_rows(excel_file, customer_id)
+    return df_customer.assign(customer_id=df_customer['customer_id'].astype(str))
+
+
+# the columns of the raw snapshot as they are exported , the index stored with the snapshot is not one of the excel
+# columns and the customer id is a text
+def get_export_schema(raw_dataset):
+    return pyarrow.schema([field.with_type(pyarrow.string()) if field.name == 'customer_id' else field
+                           for field in raw_dataset.schema if not field.name.startswith('__index_level_')])
+
+
+# this function returns the export rows of one customer in chunks of at most chunk_rows rows , only one chunk is in
+# memory at a time when they are read from the raw snapshot
+def iter_customer_export_chunks(excel_file, customer_id, chunk_rows=10000):
+    raw_file = os.path.join(get_snapshot_folder(excel_file), 'raw.parquet')
+    if snapshot_available and os.path.exists(raw_file):
+        raw_dataset = pyarrow.dataset.dataset(raw_file)
+        columns = get_export_schema(raw_dataset).names
+        for batch in raw_dataset.to_batches(columns=columns, batch_size=chunk_rows,
+                                            filter=pyarrow.dataset.field('customer_id') == int(customer_id)):
+            if batch.num_rows:
+                df_chunk = batch.to_pandas()
+                yield df_chunk.assign(customer_id=df_chunk['customer_id'].astype(str))
+        return
+
+    df_customer = get_customer_export_rows(excel_file, customer_id).reset_index(drop=True)
+    for start in range(0, len(df_customer), chunk_rows):
+        yield df_customer.iloc[start:start + chunk_rows]
+
+
+# the formats the customer data can be exported to ( file extension : mime type ) , parquet needs pyarrow
+def get_export_formats():
+    formats = OrderedDict([('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+                           ('csv', 'text/csv')])
+    if snapshot_available:
+        formats['parquet'] = 'application/octet-stream'
+    return formats
+
+
+# this function writes the export chunks to an excel file , xlsxwriter in constant memory mode writes every row to the
+# file as soon as it is added , so the workbook is never held in memory . without xlsxwriter the chunks are put
+# together and written with pandas
+def write_excel_export(chunks, path):
+    if not xlsxwriter_available:
+        chunks = list(chunks)
+        df_export = pd.concat(chunks) if chunks else pd.DataFrame()
+        df_export.to_excel(path, index=False)
+        return
+
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True, 'default_date_format': 'yyyy-mm-dd hh:mm:ss'})
+    worksheet = workbook.add_worksheet()
+    header_format = workbook.add_format({'bold': True})
+    row_number = 0
+    for df_chunk in chunks:
+        if row_number == 0:
+            worksheet.write_row(0, 0, list(df_chunk.columns), header_format)
+            row_number = 1
+        # the empty values are left as empty cells
+        values = df_chunk.astype(object).where(df_chunk.notna(), None)
+        for row in values.itertuples(index=False):
+            worksheet.write_row(row_number, 0, row)
+            row_number += 1
+    workbook.close()
+
+
+# this function writes the export chunks to a parquet file , one row group per chunk . the columns types are the ones of
+# the raw snapshot ( a chunk can have a column with only empty values ) , or the ones of the first chunk without it
+def write_parquet_export(chunks, path, excel_file):
+    raw_file = os.path.join(get_snapshot_folder(excel_file), 'raw.parquet')
+    schema = get_export_schema(pyarrow.dataset.dataset(raw_file)) if os.path.exists(raw_file) else None
+    writer = None
+    try:
+        for df_chunk in chunks:
+            table = pyarrow.Table.from_pandas(df_chunk, schema=schema, preserve_index=False)
+            if writer is None:
+                writer = pyarrow.parquet.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        pd.DataFrame().to_parquet(path, index=False)
+
+
+# this function returns the bytes of the export file of one customer in pieces , that can be sent as a streamed response .
+# the csv is made chunk by chunk while it is sent , the excel and parquet files are written to a temporary file first
+# ( their formats can't be sent before they are complete ) which is sent in pieces and deleted after
+def iter_customer_export(excel_file, customer_id, export_format, chunk_rows=10000, piece_size=1024 * 1024):
+    chunks = iter_customer_export_chunks(excel_file, customer_id, chunk_rows)
+    if export_format == 'csv':
+        for number, df_chunk in enumerate(chunks):
+            yield df_chunk.to_csv(index=False, header=number == 0).encode('utf-8')
+        return
+
+    file_descriptor, path = tempfile.mkstemp(suffix='.' + export_format)
+    os.close(file_descriptor)
+    try:
+        if export_format == 'xlsx':
+            write_excel_export(chunks, path)
+        else:
+            write_parquet_export(chunks, path, excel_file)
+        with open(path, 'rb') as file:
+            while True:
+                piece = file.read(piece_size)
+                if not piece:
+                    break
+                yield piece
+    finally:
+        os.remove(path)
+
+
+# this function returns the memory used by the dataframe columns in a readable text
+def get_memory_report(df):
+    usage = df.memory_usage(index=True, deep=True)
+    return '{} rows , {:.2f} MB ( {} )'.format(len(df), usage.sum() / 1e6,
+                                              ' , '.join('{} {:.2f}'.format(name, size / 1e6) for name, size in usage.items()))
+
+
+# the years are stored as integers , the years dropdown value can still come as a text ,
+# a cleared years dropdown ( None ) is kept as None so it matches no year
+def normalize_year(year):
+    if year is None or year == '':
+        return None
+    return year if year == all_years else int(year)
+
+
+# returning the memory used by a cached value in bytes , the categories of a categorical column are shared with the
+# dataset dataframe so only its codes are counted
+def get_frame_size(frame):
+    size = frame.index.memory_usage(deep=True)
+    for name, column in frame.items():
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            size += column.cat.codes.memory_usage(index=False, deep=False)
+        else:
+            size += column.memory_usage(index=False, deep=True)
+    return int(size)
+
+
+# a least recently used cache bounded by entries count and by memory , it is shared by all the callbacks of the process
+class LRUCache:
+    def __init__(self, max_entries=512, max_bytes=128 * 1024 * 1024, get_size=get_frame_size):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.get_size = get_size
+        self.entries = OrderedDict()
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+        # the oldest dataset version kept , the values of older versions are not cached anymore
+        self.version = 0
+
+    def lookup(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return True, self.entries[key][0]
+        return False, None
+
+    def put(self, key, value):
+        size = self.get_size(value)
+        with self.lock:
+            # a value bigger than the whole cache is never kept , nor a value of a dataset version replaced since
+            # it was computed ( a callback still running on the old version )
+            if size > self.max_bytes or key in self.entries or key[0] < self.version:
+                return
+            self.entries[key] = (value, size)
+            self.bytes += size
+            while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+                old_size = self.entries.popitem(last=False)[1][1]
+                self.bytes -= old_size
+                self.evictions += 1
+
+    # returning the cached value of the key , or computing it once with compute() ,
+    # callbacks asking for the same key at the same time wait for the first one instead of computing it again
+    def get(self, key, compute):
+        found, value = self.lookup(key)
+        if found:
+            return value
+
+        with self.lock:
+            pending = self.pending.get(key)
+            owner = pending is None
+            if owner:
+                pending = self.pending[key] = threading.Event()
+
+        if not owner:
+            pending.wait()
+            found, value = self.lookup(key)
+            if found:
+                return value
+
+        with self.lock:
+            self.misses += 1
+        try:
+            value = compute()
+            self.put(key, value)
+        finally:
+            if owner:
+                with self.lock:
+                    del self.pending[key]
+                pending.set()
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    # removing the entries of the old dataset versions and not caching them anymore ( the first item of every key is the
+    # dataset version )
+    def invalidate(self, version):
+        with self.lock:
+            self.version = version
+            for key in [key for key in self.entries if key[0] != version]:
+                self.bytes -= self.entries.pop(key)[1]
+
+    def stats(self):
+        with self.lock:
+            return dict(hits=self.hits, misses=self.misses, evictions=self.evictions, bytes=self.bytes,
+                        entries=len(self.entries), max_entries=self.max_entries, max_bytes=self.max_bytes)
+
+
+# returning the memory used by a dict of dataframes
+def get_frames_size(frames):
+    return sum(get_frame_size(frame) for frame in frames.values())
+
+
+# the filtered customer slices , keyed by the dataset version and the 4 dropdowns values
+slice_cache = LRUCache()
+# the line chart sums of every slice at all the resolutions , keyed like the slices
+series_cache = LRUCache(get_size=get_frames_size)
+# the banks x sectors counts of every slice used by the stacked bar chart , keyed like the slices
+crosstab_cache = LRUCache(get_size=get_frames_size)
+
+
+# this class holds the prepared dataframe with the indexes built on it once at load time
+class Dataset:
+    backend = 'pandas'
+
+    def __init__(self, df, version=1):
+        # the customer index needs the rows of every customer to be contiguous
+        if not df['customer_id'].is_monotonic_increasing:
+            df = df.sort_values('customer_id', kind='stable')
+        self.df = df
+        self.version = version
+        self.build_customer_index()
+        self.build_ide_index()
+        self.build_filter_index()
+        self.build_indicators_cube()
+        self.build_facets()
+        self.build_search_index()
+
+    # mapping every customer_id to the (start, stop) positions of its rows
+    def build_customer_index(self):
+        ids = self.df['customer_id'].to_numpy()
+        starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]]) if len(ids) else np.array([], dtype=int)
+        stops = np.r_[starts[1:], len(ids)]
+        self.customer_index = dict(zip(ids[starts], zip(starts.tolist(), stops.tolist())))
+
+        # the customers in the order they appear in the excel file ( the first row of each customer keeps its original label )
+        order = np.argsort(self.df.index.to_numpy()[starts], kind='stable')
+        self.customers_ids = ids[starts][order]
+
+    # returning the rows of one customer as a view on the dataframe , without scanning the other customers rows
+    def get_customer_rows(self, customer_id):
+        start, stop = self.customer_index.get(customer_id, (0, 0))
+        return self.df.iloc[start:stop]
+
+    def has_customer(self, customer_id):
+        return customer_id in self.customer_index
+
+    # returning the number of operations of every customer
+    def get_operations_counts(self):
+        return {customer_id: stop - start for customer_id, (start, stop) in self.customer_index.items()}
+
+    # returning the customer_id of the row with the index label ( the row number in the excel sheet )
+    def get_row_customer(self, label):
+        return self.df['customer_id'][label]
+
+    def get_report(self):
+        return get_memory_report(self.df)
+
+    # the rows are in memory , there is nothing to close when the dataset is replaced
+    def close(self):
+        pass
+
+    # mapping every operation ide to the position of its row ( the first one if an ide is repeated )
+    def build_ide_index(self):
+        ides = self.df['ide'].to_numpy()
+        positions = np.arange(len(ides))
+        self.ide_index = dict(zip(ides[::-1].tolist(), positions[::-1].tolist()))
+
+    # returning the customer_id of the operation ide , None when the ide is not in the dataset
+    def get_ide_customer(self, ide):
+        position = self.ide_index.get(ide)
+        if position is None:
+            return None
+        return self.df['customer_id'].iat[position]
+
+    # building the hierarchical index customer -> bank -> sector -> year -> rows positions
+    def build_filter_index(self):
+        self.filter_index = {}
+        # the rows with an empty bank , sector or year are kept ( under an empty key ) so the 'All ...' values match them
+        # like they do in get_customer_rows
+        groups = self.df.groupby(['customer_id', 'bank_name', 'sector_name4', 'Year'], sort=False, observed=True,
+                                 dropna=False).indices
+        for (customer_id, bank, sector, year), positions in groups.items():
+            self.filter_index.setdefault(customer_id, {}).setdefault(bank, {}).setdefault(sector, {})[year] = positions
+
+    # returning the rows of the customer matching the bank , sector and year dropdowns values ,
+    # the 'All ...' values are wildcards so every child of that level of the index is taken
+    def filter_rows(self, customer_id, bank, sector, year):
+        year = normalize_year(year)
+        if bank == all_banks and sector == all_sectors and year == all_years:
+            return self.get_customer_rows(customer_id)
+
+        banks_level = self.filter_index.get(customer_id, {})
+        banks = banks_level.values() if bank == all_banks else [banks_level.get(bank, {})]
+
+        positions = []
+        for sectors_level in banks:
+            sectors = sectors_level.values() if sector == all_sectors else [sectors_level.get(sector, {})]
+            for years_level in sectors:
+                if year == all_years:
+                    positions.extend(years_level.values())
+                elif year in years_level:
+                    positions.append(years_level[year])
+
+        # keeping the rows in the same order they have in the dataframe
+        positions = np.sort(np.concatenate(positions)) if positions else np.array([], dtype=int)
+        return self.df.iloc[positions]
+
+    # building the cube of the information cards aggregates , for every (customer, bank, sector, year) cell and for all
+    # the 'All ...' rollups it stores the sums and the not empty counts of the cards columns and the operations count
+    def build_indicators_cube(self):
+        values = Functions.get_indicators_columns_values(self.df)
+        not_empty = ~np.isnan(values)
+
+        dimensions = ['customer_id', 'bank_name', 'sector_name4', 'Year']
+        parts = pd.DataFrame(np.hstack([np.where(not_empty, values, 0), not_empty, self.df[['ide']].notna()]),
+                             index=pd.MultiIndex.from_frame(self.df[dimensions]))
+        # the rows with an empty bank , sector or year are kept so the rollups of the 'All ...' values count them like
+        # the filter index does
+        cells = parts.groupby(level=dimensions, sort=False, observed=True, dropna=False).sum()
+
+        self.indicators_cube = {}
+        wildcards = [all_banks, all_sectors, all_years]
+        for rollup in range(8):
+            # every bit of rollup tells if one of bank , sector and year is replaced by its 'All ...' value
+            kept = [level for i, level in enumerate(dimensions[1:]) if not rollup & (1 << i)]
+            rolled = cells.groupby(level=['customer_id'] + kept, sort=False, observed=True, dropna=False).sum() if kept \
+                else cells.groupby(level='customer_id', sort=False, observed=True, dropna=False).sum()
+
+            keys = rolled.index.to_list()
+            for key, row in zip(keys, rolled.to_numpy()):
+                key = key if isinstance(key, tuple) else (key,)
+                kept_values = dict(zip(kept, key[1:]))
+                cube_key = (key[0],) + tuple(kept_values.get(level, wildcards[i]) for i, level in enumerate(dimensions[1:]))
+                self.indicators_cube[cube_key] = row
+
+    # returning the information cards values of the 4 dropdowns values from the cube , without touching the rows
+    def get_indicators(self, customer_id, bank, sector, year):
+        count = len(Functions.indicators_sum_columns + Functions.indicators_mean_columns)
+        row = self.indicators_cube.get((customer_id, bank, sector, normalize_year(year)))
+        if row is None:
+            row = np.zeros(2 * count + 1)
+        return Functions.get_indicators_values_from_aggregates(row[:count], row[count:2 * count], row[2 * count])
+
+    # building the dropdowns facets from the filter index , for every (customer, sector, bank) with the 'All ...' values
+    # it stores the sorted lists of the banks , sectors and years found in the rows matching them
+    def build_facets(self):
+        facets = {}
+        for customer_id, banks_level in self.filter_index.items():
+            for bank, sectors_level in banks_level.items():
+                for sector, years_level in sectors_level.items():
+                    # an empty bank , sector or year is not a dropdown option
+                    years_level = [year for year in years_level if not pd.isna(year)]
+                    if pd.isna(bank) or pd.isna(sector) or not years_level:
+                        continue
+                    for key in ((customer_id, all_sectors, all_banks), (customer_id, sector, all_banks),
+                                (customer_id, all_sectors, bank), (customer_id, sector, bank)):
+                        banks, sectors, years = facets.setdefault(key, (set(), set(), set()))
+                        banks.add(str(bank))
+                        sectors.add(str(sector))
+                        years.update(int(year) for year in years_level)
+
+        self.facets = {key: dict(banks=sorted(banks), sectors=sorted(sectors), years=sorted(years))
+                       for key, (banks, sectors, years) in facets.items()}
+
+    # returning the banks , sectors and years lists of the customer for the selected sector and bank
+    def get_facets(self, customer_id, sector=all_sectors, bank=all_banks):
+        return self.facets.get((customer_id, sector, bank), dict(banks=[], sectors=[], years=[]))
+
+    # building the customers search index , the lower case customers ids and names are kept sorted for the prefix search
+    # and joined in one column for the substring search
+    def build_search_index(self):
+        starts = [self.customer_index[customer_id][0] for customer_id in self.customers_ids]
+        self.customers_names = self.df['customer_name'].to_numpy()[starts].astype(str)
+
+        ids = pd.Series(self.customers_ids.astype(str)).str.lower()
+        names = pd.Series(self.customers_names).str.lower()
+        self.search_keys = []
+        for keys in (ids, names):
+            order = np.argsort(keys.to_numpy(), kind='stable')
+            self.search_keys.append((keys.to_numpy()[order].tolist(), order))
+        self.search_text = ids + '\t' + names
+
+    # returning the customer name shown for the customer ( the name of its first row )
+    def get_customer_name(self, customer_id):
+        start, stop = self.customer_index.get(customer_id, (0, 0))
+        return self.df['customer_name'].iat[start] if stop > start else ''
+
+    # returning at most limit (customer id, customer name) matching the search text , the customers whose id or name
+    # starts with the text come first then the ones containing it
+    def search_customers(self, text, limit=20):
+        text = text.strip().lower()
+        found = []
+        for keys, order in self.search_keys:
+            start = bisect_left(keys, text)
+            stop = bisect_left(keys, text + '\uffff')
+            found.extend(order[start:min(stop, start + limit)])
+
+        if len(set(found)) < limit:
+            found.extend(np.flatnonzero(self.search_text.str.contains(text, regex=False).to_numpy())[:2 * limit])
+
+        results = []
+        for position in dict.fromkeys(found):
+            results.append((self.customers_ids[position], self.customers_names[position]))
+            if len(results) == limit:
+                break
+        return results
+
+    # the same as filter_rows but the result is kept in the shared slice cache , the returned dataframe must not be modified
+    def get_slice(self, customer_id, bank, sector, year):
+        key = (self.version, customer_id, bank, sector, normalize_year(year))
+        return slice_cache.get(key, lambda: self.filter_rows(customer_id, bank, sector, year))
+
+    # the line chart sums of the slice at all the resolutions , built once and kept in the series cache
+    def get_line_chart_pyramid(self, customer_id, bank, sector, year):
+        key = (self.version, customer_id, bank, sector, normalize_year(year))
+        return series_cache.get(key, lambda: Functions.get_line_chart_pyramid(
+            self.get_slice(customer_id, bank, sector, year)))
+
+    # the banks x sectors counts of the slice , built once and kept in the crosstab cache
+    def get_bank_sector_counts(self, customer_id, bank, sector, year):
+        key = (self.version, customer_id, bank, sector, normalize_year(year))
+        return crosstab_cache.get(key, lambda: Functions.get_bank_sector_counts(
+            self.get_slice(customer_id, bank, sector, year)))
+
+
+# the sqlite store is kept in the snapshot folder next to the parquet files
+def get_sqlite_file(excel_file):
+    return os.path.join(get_snapshot_folder(excel_file), 'data.sqlite')
+
+
+# returning the meta values saved in the sqlite store , None when the file is missing or not a store
+def read_sqlite_meta(sqlite_file):
+    if not os.path.exists(sqlite_file):
+        return None
+    try:
+        connection = sqlite3.connect('file:{}?mode=ro'.format(sqlite_file), uri=True)
+        try:
+            meta = json.loads(connection.execute("SELECT value FROM meta WHERE key = 'meta'").fetchone()[0])
+        finally:
+            connection.close()
+    except (sqlite3.Error, TypeError, ValueError):
+        return None
+
+    if meta.get('snapshot_version') != snapshot_version:
+        return None
+    return meta
+
+
+# this function writes the prepared dataframe to a new sqlite store : the operations rows ( with their position in
+# the dataframe and their index label ) , the customers in the order they appear in the excel file for the search ,
+# and the indexes of the filters
+def write_sqlite_database(sqlite_file, df, meta):
+    operations = df.reset_index(drop=False, names='row_label')
+    operations.insert(0, 'position', np.arange(len(operations)))
+    for column in categorical_columns:
+        operations[column] = operations[column].astype(object)
+    operations['approval_date'] = operations['approval_date'].dt.strftime('%Y-%m-%d %H:%M:%S')
+
+    # the first row of every customer , ordered like the customers_ids of the pandas dataset
+    first_rows = df[~df['customer_id'].duplicated()]
+    first_rows = first_rows.iloc[np.argsort(first_rows.index.to_numpy(), kind='stable')]
+    customers_names = first_rows['customer_name'].to_numpy().astype(str)
+    customers = pd.DataFrame(dict(position=np.arange(len(first_rows)), customer_id=first_rows['customer_id'].astype(str).to_numpy(),
+                                  customer_name=first_rows['customer_name'].astype(object).to_numpy(),
+                                  id_key=pd.Series(first_rows['customer_id'].to_numpy().astype(str)).str.lower().to_numpy(),
+                                  name_key=pd.Series(customers_names).str.lower().to_numpy()))
+
+    meta = dict(meta, dtypes={column: str(dtype) for column, dtype in df.dtypes.items()}, rows=len(df))
+    os.makedirs(os.path.dirname(sqlite_file), exist_ok=True)
+    tmp_file = '{}.{}.tmp'.format(sqlite_file, os.getpid())
+    if os.path.exists(tmp_file):
+        os.remove(tmp_file)
+    connection = sqlite3.connect(tmp_file)
+    try:
+        operations.to_sql('operations', connection, index=False, chunksize=10000)
+        customers.to_sql('customers', connection, index=False, chunksize=10000)
+        connection.executescript('''
+            CREATE UNIQUE INDEX operations_position ON operations (position);
+            CREATE INDEX operations_filters ON operations (customer_id, bank_name, sector_name4, Year, position);
+            CREATE INDEX operations_bank ON operations (bank_name);
+            CREATE INDEX operations_sector ON operations (sector_name4);
+            CREATE INDEX operations_year ON operations (Year);
+            CREATE INDEX operations_ide ON operations (ide, position);
+            CREATE INDEX operations_row_label ON operations (row_label);
+            CREATE UNIQUE INDEX customers_position ON customers (position);
+            CREATE UNIQUE INDEX customers_id ON customers (customer_id);
+            CREATE INDEX customers_id_key ON customers (id_key, position);
+            CREATE INDEX customers_name_key ON customers (name_key, position);
+            CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+        ''')
+        connection.execute("INSERT INTO meta VALUES ('meta', ?)", (json.dumps(meta),))
+        connection.commit()
+    finally:
+        connection.close()
+    os.replace(tmp_file, sqlite_file)
+
+
+# this function returns the sqlite store of the excel file , it is built again ( from the prepared dataframe of
+# load_database ) only when the excel file changed since it was built , so the workers started after it share it as it is
+def build_sqlite_database(excel_file):
+    sqlite_file = get_sqlite_file(excel_file)
+    stat = os.stat(excel_file)
+    meta = read_sqlite_meta(sqlite_file)
+    if meta is not None:
+        if meta['mtime'] == stat.st_mtime_ns and meta['size'] == stat.st_size:
+            return sqlite_file
+        file_hash = get_file_hash(excel_file)
+        if meta['hash'] == file_hash:
+            return sqlite_file
+    else:
+        file_hash = get_file_hash(excel_file)
+
+    df = load_database(excel_file)
+    write_sqlite_database(sqlite_file, df, dict(snapshot_version=snapshot_version, mtime=stat.st_mtime_ns,
+                                                size=stat.st_size, hash=file_hash))
+    return sqlite_file
+
+
+# this class has the same methods as Dataset used by the callbacks , but the rows stay in the sqlite store : the filters ,
+# the information cards aggregates , the dropdowns facets and the customers search are indexed sql queries , only the
+# rows of the slices asked are read ( and kept in the shared slice cache like with the pandas dataset )
+class SqliteDataset(Dataset):
+    backend = 'sqlite'
+
+    def __init__(self, sqlite_file, version=1):
+        self.sqlite_file = sqlite_file
+        self.version = version
+        self.meta = read_sqlite_meta(sqlite_file)
+        # every thread has its own read only connection , all of them are also kept in entries to close them
+        self.local = threading.local()
+        self.entries = []
+        self.entries_lock = threading.Lock()
+
+    def connect(self):
+        return sqlite3.connect('file:{}?mode=ro'.format(self.sqlite_file), uri=True, check_same_thread=False)
+
+    # closing the connections of the entries , each one with its lock so it is not closed while a query uses it
+    def close_entries(self, entries):
+        for entry in entries:
+            with entry['lock']:
+                if entry['connection'] is not None:
+                    entry['connection'].close()
+                    entry['connection'] = None
+
+    # returning the connection entry of the thread , a connection inherited by a forked process ( the background
+    # pdf jobs ) must not be used in it , so the entry records the process that opened it and a new one is made in
+    # the child . the connections of the finished threads of this process are closed at the same time
+    def get_connection_entry(self):
+        entry = getattr(self.local, 'entry', None)
+        if entry is None or entry['pid'] != os.getpid():
+            entry = dict(pid=os.getpid(), thread=threading.current_thread(), connection=None, lock=threading.Lock())
+            self.local.entry = entry
+            kept, finished = [], []
+            with self.entries_lock:
+                for old in self.entries:
+                    if old['pid'] == entry['pid'] and not old['thread'].is_alive():
+                        finished.append(old)
+                    else:
+                        kept.append(old)
+                self.entries = kept + [entry]
+            self.close_entries(finished)
+        return entry
+
+    # running read with the connection of the thread , it is opened again if close() closed it meanwhile
+    def read(self, read):
+        entry = self.get_connection_entry()
+        with entry['lock']:
+            if entry['connection'] is None:
+                entry['connection'] = self.connect()
+            return read(entry['connection'])
+
+    def query(self, sql, params=()):
+        return self.read(lambda connection: connection.execute(sql, params).fetchall())
+
+    # closing the connections opened by this process , called when a reload replaces the dataset ( a callback still
+    # running on it opens its connection again )
+    def close(self):
+        with self.entries_lock:
+            entries = [entry for entry in self.entries if entry['pid'] == os.getpid()]
+        self.close_entries(entries)
+
+    # the where clause of the 4 dropdowns values , the 'All ...' values don't filter their column
+    def get_filter_clause(self, customer_id, bank=all_banks, sector=all_sectors, year=all_years):
+        year = normalize_year(year)
+        clauses, params = ['customer_id = ?'], [customer_id]
+        for column, value, wildcard in (('bank_name', bank, all_banks), ('sector_name4', sector, all_sectors),
+                                        ('Year', year, all_years)):
+            if value != wildcard:
+                clauses.append('{} = ?'.format(column))
+                params.append(value)
+        return ' AND '.join(clauses), params
+
+    @property
+    def customers_ids(self):
+        return np.array([row[0] for row in self.query('SELECT customer_id FROM customers ORDER BY position')], dtype=object)
+
+    def has_customer(self, customer_id):
+        return bool(self.query('SELECT 1 FROM customers WHERE customer_id = ?', (customer_id,)))
+
+    def get_operations_counts(self):
+        return dict(self.query('SELECT customer_id, COUNT(*) FROM operations GROUP BY customer_id'))
+
+    def get_row_customer(self, label):
+        return self.query('SELECT customer_id FROM operations WHERE row_label = ?', (int(label),))[0][0]
+
+    def get_report(self):
+        return '{} rows in {} ( {:.2f} MB on disk )'.format(self.meta['rows'], self.sqlite_file,
+                                                            os.path.getsize(self.sqlite_file) / 1e6)
+
+    # reading the rows matching the where clause in the order of the dataframe , with the same types as the dataframe
+    # columns and the same index labels
+    def read_rows(self, clause, params):
+        dtypes = self.meta['dtypes']
+        frame = self.read(lambda connection: pd.read_sql_query(
+            'SELECT row_label, {} FROM operations WHERE {} ORDER BY position'.format(', '.join(dtypes), clause),
+            connection, params=params, index_col='row_label'))
+        frame.index = frame.index.astype('int64').rename(None)
+        frame['approval_date'] = pd.to_datetime(frame['approval_date'])
+        return frame.astype(dtypes)
+
+    def get_customer_rows(self, customer_id):
+        return self.read_rows(*self.get_filter_clause(customer_id))
+
+    def get_ide_customer(self, ide):
+        rows = self.query('SELECT customer_id FROM operations WHERE ide = ? ORDER BY position LIMIT 1', (ide,))
+        return rows[0][0] if rows else None
+
+    def filter_rows(self, customer_id, bank, sector, year):
+        return self.read_rows(*self.get_filter_clause(customer_id, bank, sector, year))
+
+    # the sums and the not empty counts of the cards columns and the operations count , summed by sqlite
+    def get_indicators(self, customer_id, bank, sector, year):
+        columns = Functions.indicators_sum_columns + Functions.indicators_mean_columns
+        clause, params = self.get_filter_clause(customer_id, bank, sector, year)
+        row = np.array(self.query('SELECT {}, {}, COUNT(ide) FROM operations WHERE {}'.format(
+            ', '.join('TOTAL(ROUND({}, 6))'.format(column) for column in columns),
+            ', '.join('COUNT({})'.format(column) for column in columns), clause), params)[0], dtype='float64')
+        count = len(columns)
+        return Functions.get_indicators_values_from_aggregates(row[:count], row[count:2 * count], row[2 * count])
+
+    # the rows with an empty bank , sector or year are not in the facets , like in the pandas facets
+    def get_facets(self, customer_id, sector=all_sectors, bank=all_banks):
+        clause, params = self.get_filter_clause(customer_id, bank, sector)
+        rows = self.query('SELECT DISTINCT bank_name, sector_name4, Year FROM operations WHERE {} AND bank_name IS NOT NULL '
+                          'AND sector_name4 IS NOT NULL AND Year IS NOT NULL'.format(clause), params)
+        return dict(banks=sorted({str(row[0]) for row in rows}), sectors=sorted({str(row[1]) for row in rows}),
+                    years=sorted({int(row[2]) for row in rows}))
+
+    def get_customer_name(self, customer_id):
+        rows = self.query('SELECT customer_name FROM customers WHERE customer_id = ?', (customer_id,))
+        return rows[0][0] if rows else ''
+
+    # the same search as the pandas dataset , the prefix search uses the indexes of the lower case ids and names
+    def search_customers(self, text, limit=20):
+        text = text.strip().lower()
+        found = []
+        for key in ('id_key', 'name_key'):
+            found.extend(row[0] for row in self.query(
+                'SELECT position FROM customers WHERE {0} >= ? AND {0} < ? ORDER BY {0}, position LIMIT ?'.format(key),
+                (text, text + '\uffff', limit)))
+
+        if len(set(found)) < limit:
+            found.extend(row[0] for row in self.query(
+                "SELECT position FROM customers WHERE instr(id_key || char(9) || name_key, ?) > 0 ORDER BY position LIMIT ?",
+                (text, 2 * limit)))
+
+        positions = list(dict.fromkeys(found))[:limit]
+        if not positions:
+            return []
+        names = dict((row[0], (row[1], row[2])) for row in self.query(
+            'SELECT position, customer_id, customer_name FROM customers WHERE position IN ({})'.format(
+                ', '.join('?' * len(positions))), positions))
+        return [(names[position][0], str(names[position][1])) for position in positions]
+
+
+# the dataset used by the callbacks , it is replaced as a whole when the database is reloaded so a callback that took it
+# with get_dataset keeps working on the same version until it finishes
+current_dataset = None
+reload_lock = threading.Lock()
+
+
+def get_dataset():
+    return current_dataset
+
+
+# this function builds the dataset of the storage backend , 'pandas' ( all the rows in memory ) or 'sqlite'
+def make_dataset(excel_file, backend='pandas', version=1):
+    if backend == 'sqlite':
+        return SqliteDataset(build_sqlite_database(excel_file), version=version)
+    return Dataset(load_database(excel_file), version=version)
+
+
+def load_dataset(excel_file, backend='pandas'):
+    global current_dataset
+    current_dataset = make_dataset(excel_file, backend)
+    return current_dataset
+
+
+# this function builds the new dataset and all its indexes next to the current one , then swaps them in one step
+# and removes the cached values of the old version
+def reload_dataset(excel_file):
+    global current_dataset
+    with reload_lock:
+        old_dataset = current_dataset
+        dataset = make_dataset(excel_file, old_dataset.backend, version=old_dataset.version + 1)
+        current_dataset = dataset
+        slice_cache.invalidate(dataset.version)
+        series_cache.invalidate(dataset.version)
+        crosstab_cache.invalidate(dataset.version)
+        old_dataset.close()
+    return dataset
+
+
+# this function returns what is used to know that the excel file changed
+def get_file_state(excel_file):
+    try:
+        stat = os.stat(excel_file)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+# this function starts a background thread that reloads the dataset whenever the excel file changes
+def start_watcher(excel_file, interval=10):
+    def watch():
+        last_state = get_file_state(excel_file)
+        while True:
+            time.sleep(interval)
+            state = get_file_state(excel_file)
+            if state is None or state == last_state:
+                continue
+            try:
+                reload_dataset(excel_file)
+            except Exception as e:
+                # the file can be in the middle of being saved , it is tried again on the next check
+                print('database reload failed : {!r}'.format(e))
+                continue
+            last_state = state
+            print('database reloaded : version {}'.format(current_dataset.version))
+
+    thread = threading.Thread(target=watch, name='database-watcher', daemon=True)
+    thread.start()
+    return thread
+
+
+# this function reloads the dataset on a background thread , used by the admin reload route
+def reload_in_background(excel_file):
+    thread = threading.Thread(target=reload_dataset, args=(excel_file,), name='database-reload', daemon=True)
+    thread.start()
+    return thread
@@ -1,11 +1,17 @@
+import numpy as np
 import pandas as pd
 import base64
 import plotly.express as px
 import plotly.graph_objects as go
-from dash import dcc, html , dash_table
+from dash import dcc, html , dash_table, Patch
 from collections import OrderedDict
+import fpdf
 from fpdf import FPDF
 
+# the fast pdf table is written with the internals of pyfpdf 1.7.2 ( its buffer , _out , k and page_break_trigger ) ,
+# with another fpdf ( fpdf2 is also imported as fpdf ) the table is drawn with one cell per value like before
+pdf_raw_output=getattr(fpdf,'__version__',None)=='1.7.2'
+
 base_colors={ 'color1': '#EBECF0', 'color2': '#F5F5F5','color3': '#0f70e0'}
 
 indicator_size=22
@@ -13,12 +19,63 @@ indicator_text_color='white'
 indicator_bg_color=base_colors['color3']
 indicator_height=40
 
-# generating the pdf report from the data got from the dashboard
+# this function returns the texts of a column of the pdf table ( escaped like fpdf does for the texts written in the
+# pdf ) and their widths in the current font , the column is formatted at once and every different text is measured once
+def get_pdf_column_texts(pdf,column):
+    codes,unique_texts=pd.factorize(pd.Series(column).astype(str))
+    widths=np.array([pdf.get_string_width(text) for text in unique_texts],dtype='float64')
+    unique_texts=np.array([text.replace('\\','\\\\').replace('(','\\(').replace(')','\\)').replace('\r','\\r') for text in unique_texts],dtype=object)
+    return unique_texts[codes],widths[codes]
+
+
+# a text buffer for fpdf keeping the written parts in a list , fpdf adds every line of the document to its buffer string
+# which copies the whole document each time and is very slow for big reports
+class PdfBuffer:
+    def __init__(self):
+        self.parts=[]
+        self.length=0
+
+    def __iadd__(self,text):
+        self.parts.append(text)
+        self.length+=len(text)
+        return self
+
+    def __len__(self):
+        return self.length
+
+    def __str__(self):
+        return ''.join(self.parts)
+
+
+# this function returns the pdf content of the table rows from first_row to first_row+rows_count , drawn from the
+# height y of the page like fpdf draws bordered cells with centered texts , but made for all the cells at once
+def get_pdf_table_rows(pdf,columns_texts,columns_widths,first_row,rows_count,y,col_width,row_height):
+    k=pdf.k
+    rows_y=y+np.arange(rows_count)*row_height
+    rects_y=np.char.mod('%.2f',(pdf.h-rows_y)*k)
+    texts_y=np.char.mod('%.2f',(pdf.h-(rows_y+.5*row_height+.3*pdf.font_size))*k)
+    rect_size=' %.2f %.2f re S ' % (col_width*k,-row_height*k)
+
+    cells=[]
+    for column,(texts,widths) in enumerate(zip(columns_texts,columns_widths)):
+        texts=texts[first_row:first_row+rows_count]
+        x=pdf.l_margin+column*col_width
+        texts_x=np.char.mod('%.2f',(x+(col_width-widths[first_row:first_row+rows_count])/2.0)*k)
+        rects=('%.2f ' % (x*k))+rects_y.astype(object)+rect_size
+        texts_ops='BT '+texts_x.astype(object)+' '+texts_y.astype(object)+' Td ('+texts+') Tj ET'
+        # an empty text only has its border
+        cells.append(np.where(texts=='',rects,rects+texts_ops))
+
+    return '\n'.join(np.stack(cells,axis=1).ravel())
+
+
+# generating the pdf report from the data got from the dashboard , the table is drawn page by page with its header
+# repeated on every page , progress is called with the rows done and the rows count after every page
 def generate_pdf_report(df_customer,pdf,customer_name,customer_id,
-                        transactions_value,deposits_value,ratej_value,rateb_value,time_value,be_paid_value,operations_value):
+                        transactions_value,deposits_value,ratej_value,rateb_value,time_value,be_paid_value,operations_value,
+                        progress=None):
 
     df=df_customer[['ide','approval_date','transaction_value','deposited_value','sector_name4','bank_name']]
-    df['approval_date']=df['approval_date'].astype(str)
 
     # adding the starting page to the pdf object
     pdf.add_page()
@@ -28,13 +85,6 @@ def generate_pdf_report(df_customer,pdf,customer_name,customer_id,
     epw = pdf.w - 1 * pdf.l_margin
     col_width = epw / 7
 
-    # creating an array of the dataframe rows to be used in the correct format the pdf object requires
-    data = []
-    for index, row in df.iterrows():
-        data.append(row.to_list())
-
-    data.insert(0,list(df.columns))
-
     # adding the first row in the pdf
     pdf.set_font('Times', 'B', 12.0)
     pdf.cell(epw, 0.0, 'Customer Name: {}  -  Customer ID: {}'.format(customer_name,customer_id), align='L')
@@ -57,29 +107,116 @@ def generate_pdf_report(df_customer,pdf,customer_name,customer_id,
     pdf.set_font('Times', '', 8.0)
     pdf.ln(0.4)
     th = pdf.font_size
-    for row in data:
-        for datum in row:
-            pdf.cell(col_width, 2 * th, str(datum), border=1,align='C')
+    row_height = 2 * th
 
-        pdf.ln(2 * th)
+    if pdf_raw_output:
+        draw_pdf_table_pages(pdf,df,col_width,row_height,progress)
+    else:
+        draw_pdf_table_cells(pdf,df,col_width,row_height,progress)
 
     pdf.ln(4 * th)
 
-    # downloading the pdf object as a pdf file in the app local directory
-    pdf.output('{}.pdf'.format(customer_id), 'F')
-
-# this function returns the filtered dataframe as a table object to be rendered in the dashboard
-def get_customer_table(df_customer):
-    df=df_customer[['ide','approval_date','transaction_value','deposited_value','sector_name4','bank_name']]
+    # returning the pdf file content ( made in memory ) , it is sent to the browser by the download component
+    return get_pdf_output(pdf)
+
+
+# this function draws the table with its header repeated on every page , the rows of a page are written in the page
+# content at once ( only with pyfpdf 1.7.2 )
+def draw_pdf_table_pages(pdf,df,col_width,row_height,progress=None):
+    # formatting the texts of every column and measuring them once for the whole table
+    columns_texts,columns_widths=zip(*[get_pdf_column_texts(pdf,df[column]) for column in df.columns])
+
+    rows_done=0
+    while True:
+        # the rows fitting in the rest of the page under the header row
+        rows_count=min(int((pdf.page_break_trigger-pdf.y)//row_height)-1,len(df)-rows_done)
+        if rows_count<=0 and rows_done<len(df):
+            pdf.add_page()
+            continue
+
+        for column in df.columns:
+            pdf.cell(col_width, row_height, str(column), border=1,align='C')
+        pdf.ln(row_height)
+
+        if rows_count>0:
+            # writing the rows of the page in the page content directly ( fpdf has no function drawing many cells )
+            pdf._out(get_pdf_table_rows(pdf,columns_texts,columns_widths,rows_done,rows_count,pdf.y,col_width,row_height))
+            pdf.y+=rows_count*row_height
+            rows_done+=rows_count
+
+        if progress is not None:
+            progress(rows_done,len(df))
+        if rows_done>=len(df):
+            break
+        pdf.add_page()
+
+
+# this function draws the table with one fpdf cell per value like before , fpdf adds the pages when they are full
+def draw_pdf_table_cells(pdf,df,col_width,row_height,progress=None,progress_rows=500):
+    for column in df.columns:
+        pdf.cell(col_width, row_height, str(column), border=1,align='C')
+    pdf.ln(row_height)
+
+    columns_texts=[df[column].astype(str).to_list() for column in df.columns]
+    for row_number,row in enumerate(zip(*columns_texts),start=1):
+        for text in row:
+            pdf.cell(col_width, row_height, text, border=1,align='C')
+        pdf.ln(row_height)
+        if progress is not None and row_number%progress_rows==0:
+            progress(row_number,len(df))
+    if progress is not None:
+        progress(len(df),len(df))
+
+
+# this function returns the bytes of the pdf document , pyfpdf 1.7.2 returns its buffer ( replaced so the end of the
+# document is not added to one big string ) , the other pyfpdf versions a text and fpdf2 the bytes
+def get_pdf_output(pdf):
+    if pdf_raw_output:
+        pdf.buffer=PdfBuffer()
+        return str(pdf.output(dest='S')).encode('latin-1')
+    content=pdf.output(dest='S')
+    if isinstance(content,str):
+        return content.encode('latin-1')
+    return bytes(content)
+
+# this function returns the texts of the information cards written in the pdf report ( in the order of the
+# generate_pdf_report arguments ) from the cards values
+def get_pdf_report_texts(values):
+    return (str(values['trans_value']) + ' R$',str(values['dep_value']) + ' R$',
+            str( round(values['ratej_value'],1) ),str( round(values['rateb_value'],1) ),
+            str(values['time_amor_value']) + ' Months',str(values['to_be_paid_value']) + ' R$',str(values['op_count_value']))
+
+# this function returns the customer id dropdown option of a customer , the name is in the label so it can be searched
+def get_customer_option(customer_id,customer_name):
+    return {'label': '{} - {}'.format(customer_id,customer_name), 'value': customer_id}
+
+# the columns shown in the table and in the pdf report
+table_columns=['ide','approval_date','transaction_value','deposited_value','sector_name4','bank_name']
+
+# this function returns the table columns of the filtered dataframe with the dates as text
+def get_table_frame(df_customer):
+    df=df_customer[table_columns].copy()
     df['approval_date']=df['approval_date'].astype(str)
+    return df
+
+# this function returns the filtered dataframe as a table object to be rendered in the dashboard ,
+# with custom_paging only the first page is sent and the paging , sorting and filtering are done on the server
+def get_customer_table(df_customer,custom_paging=False,page_size=4):
+    if custom_paging:
+        data,page_count=get_customer_table_page(df_customer,0,page_size,[],'')
+        table_options=dict(page_action='custom',filter_action='custom',sort_action='custom',sort_mode='single',
+                           page_current=0,page_count=page_count,sort_by=[],filter_query='')
+    else:
+        data=get_table_frame(df_customer).to_dict("records")
+        table_options=dict(filter_action='native')
 
     customer_table=dash_table.DataTable(
                 id='customer_table',
                 columns=[
-                    {"name": i, "id": i} for i in df.columns
+                    {"name": i, "id": i} for i in table_columns
                 ],
-                data=df.to_dict("records"),filter_action='native',
-                editable=False,  page_size=4,
+                data=data,**table_options,
+                editable=False,  page_size=page_size,
                 row_deletable=False,
         style_cell=dict(textAlign='center', border='1px solid black'
                         , backgroundColor='white', color='black', fontSize=14, fontWeight=''),
@@ -91,28 +228,157 @@ def get_customer_table(df_customer):
 
     return customer_table
 
-# this function uses the filtered dataframe to generate the stacked bar chart
-def get_stacked_bar_chart(df_customer):
-    fig=go.Figure()
+# the operators of the table filter query ( the same ones used by the native filtering )
+filter_operators = [['ge ', '>='], ['le ', '<='], ['lt ', '<'], ['gt ', '>'], ['ne ', '!='], ['eq ', '='],
+                    ['contains '], ['datestartswith ']]
+
+# this function splits one part of the table filter query ( like {transaction_value} > 1000 ) into its column , operator and value
+def split_filter_part(filter_part):
+    for operator_type in filter_operators:
+        for operator in operator_type:
+            if operator in filter_part:
+                name_part, value_part = filter_part.split(operator, 1)
+                name = name_part[name_part.find('{') + 1: name_part.rfind('}')]
+
+                # removing the quotes around the value , the value is converted to the column type later
+                value = value_part.strip()
+                v0 = value[0] if value else ''
+                if len(value) > 1 and v0 == value[-1] and v0 in ("'", '"', '`'):
+                    value = value[1: -1].replace('\\' + v0, v0)
+
+                # the word operators are stored with the trailing space
+                return name, operator_type[0].strip(), value
+
+    return [None] * 3
+
+# this function returns the rows matching the table filter query , every part is evaluated on a whole column at once
+def filter_table_frame(df,filter_query):
+    if not filter_query:
+        return df
+
+    mask=np.ones(len(df),dtype=bool)
+    for filter_part in filter_query.split(' && '):
+        col_name,operator,filter_value=split_filter_part(filter_part)
+        if col_name not in table_columns:
+            continue
+        column=df[col_name]
+
+        if operator in ('contains','datestartswith'):
+            if col_name=='approval_date':
+                text=column.dt.strftime('%Y-%m-%d')
+            else:
+                text=column.astype(str)
+            if operator=='contains':
+                mask&=text.str.contains(filter_value,regex=False).to_numpy()
+            else:
+                mask&=text.str.startswith(filter_value).to_numpy()
+            continue
+
+        # comparing the dates with dates , the numbers with numbers and the texts with texts
+        try:
+            if col_name=='approval_date':
+                filter_value=pd.Timestamp(filter_value)
+            elif col_name in ('ide','sector_name4','bank_name'):
+                column=column.astype(str)
+            else:
+                filter_value=float(filter_value)
+        except ValueError:
+            return df.iloc[0:0]
+
+        if operator=='eq':
+            mask&=(column==filter_value).to_numpy()
+        elif operator=='ne':
+            mask&=(column!=filter_value).to_numpy()
+        elif operator=='lt':
+            mask&=(column<filter_value).to_numpy()
+        elif operator=='le':
+            mask&=(column<=filter_value).to_numpy()
+        elif operator=='gt':
+            mask&=(column>filter_value).to_numpy()
+        elif operator=='ge':
+            mask&=(column>=filter_value).to_numpy()
+
+    return df[mask]
+
+# this function returns the records of one page of the table after filtering and sorting the filtered dataframe ,
+# only the rows of that page are converted to records , it also returns the pages count
+def get_customer_table_page(df_customer,page_current,page_size,sort_by,filter_query):
+    df=filter_table_frame(df_customer,filter_query)
+
+    if sort_by:
+        df=df.sort_values(sort_by[0]['column_id'],ascending=sort_by[0]['direction']=='asc',kind='stable')
+
+    page_count=max(1,-(-len(df)//page_size))
+    page_current=min(page_current or 0,page_count-1)
+    page=df.iloc[page_current*page_size:(page_current+1)*page_size]
+
+    return get_table_frame(page).to_dict("records"),page_count
+
+# this function counts the operations of every bank and sector of the filtered dataframe in one pass , it returns
+# the banks x sectors counts matrix and the position of the first row of every bank and sector pair , the banks
+# and the sectors are in the order they first appear in the rows
+def get_bank_sector_counts(df_customer):
+    bank_codes,banks=pd.factorize(df_customer['bank_name'])
+    sector_codes,sectors=pd.factorize(df_customer['sector_name4'])
+    # the operations are counted by their ide like before , the rows with an empty bank or sector are not counted
+    rows=np.flatnonzero((bank_codes>=0)&(sector_codes>=0)&df_customer['ide'].notna().to_numpy())
+    pairs=bank_codes[rows]*len(sectors)+sector_codes[rows]
+
+    counts=np.bincount(pairs,minlength=len(banks)*len(sectors)).reshape(len(banks),len(sectors))
+    first_rows=np.full(len(banks)*len(sectors),len(df_customer),dtype='int64')
+    unique_pairs,first_positions=np.unique(pairs,return_index=True)
+    first_rows[unique_pairs]=rows[first_positions]
+
+    banks,sectors=np.asarray(banks,dtype=object),np.asarray(sectors,dtype=object)
+    return dict(counts=pd.DataFrame(counts,index=banks,columns=sectors),
+                first_rows=pd.DataFrame(first_rows.reshape(len(banks),len(sectors)),index=banks,columns=sectors))
+
+
+# this function returns the bars of the stacked bar chart ( one per bank ) and the end of its y axis
+def get_stacked_bar_traces(bank_sector_counts):
+    counts=bank_sector_counts['counts']
+    first_rows=bank_sector_counts['first_rows'].to_numpy()
+
+    bars=[]
     color_list=px.colors.qualitative.D3
-    banks_list = list(df_customer['bank_name'].unique())
-    i=0
-    for bank in banks_list:
-        data=df_customer[df_customer['bank_name']==bank]
-        data=data.groupby('sector_name4',sort=False)['ide'].count()
+    for i,bank in enumerate(counts.index):
+        bank_counts=counts.iloc[i].to_numpy()
+        # the sectors of the bank in the order they first appear in its rows , then sorted by the count
+        columns=np.flatnonzero(bank_counts>0)
+        columns=columns[np.argsort(first_rows[i,columns],kind='stable')]
+        data=pd.Series(bank_counts[columns],index=counts.columns[columns])
         data.sort_values(inplace=True, ascending=False)
 
-        fig.add_trace(go.Bar(name=bank, x=data.index, y=data.astype('int64'),
-                             marker_color=color_list[i],orientation='v',text=data.astype('int64'),
+        bars.append(go.Bar(name=bank, x=data.index, y=data.astype('int64'),
+                             marker_color=color_list[i%len(color_list)],orientation='v',text=data.astype('int64'),
                textposition='auto', textfont=dict(
                 #size=13,
 
-            ))
-                      )
-        i+=1
+            ), texttemplate = '<b>%{text}</b>'))
+
+    # the y axis ends at the biggest count of a sector for all the banks
+    range=int(counts.to_numpy().sum(axis=0).max()) if counts.size else np.nan
+    return bars,range
+
+
+# this function returns the changes of the stacked bar chart figure for new counts , only the bars and the end of
+# the y axis are sent , the layout of the figure already shown stays the same
+def get_stacked_bar_patch(bank_sector_counts):
+    bars,range=get_stacked_bar_traces(bank_sector_counts)
+    patch=Patch()
+    patch['data']=[bar.to_plotly_json() for bar in bars]
+    patch['layout']['yaxis']['range']=[0,range]
+    return patch
+
+
+# this function uses the filtered dataframe to generate the stacked bar chart , the counts made by
+# get_bank_sector_counts can be given when they are already computed ( cached with the slice )
+def get_stacked_bar_chart(df_customer,bank_sector_counts=None):
+    if bank_sector_counts is None:
+        bank_sector_counts=get_bank_sector_counts(df_customer)
+    bars,range=get_stacked_bar_traces(bank_sector_counts)
 
-    range_df=df_customer.groupby('sector_name4',sort=False)['ide'].count()
-    range=range_df.astype('int64').max()
+    fig=go.Figure(bars)
     fig.update_layout(title='<b>Customer Operations count<b>',title_x=0.5,
             xaxis_title='<b>Sector<b>', yaxis_title=None,
             # '<b>Topic<b>',
@@ -125,8 +391,6 @@ def get_stacked_bar_chart(df_customer):
     fig.update_yaxes(showgrid=False, showline=True, zeroline=False, linecolor='black',
                          visible=True, showticklabels=True)
 
-    fig.update_traces(texttemplate = '<b>%{text}</b>')
-
     stacked_bar_chart_div = dcc.Graph(id='stacked_bar_chart', config={'displayModeBar': True, 'displaylogo': False,
                                               'modeBarButtonsToRemove': ['lasso2d', 'pan', 'zoom2d', 'zoomIn2d',
                                                                          'zoomOut2d', 'autoScale2d']}
@@ -135,39 +399,127 @@ def get_stacked_bar_chart(df_customer):
                   )
     return stacked_bar_chart_div
 
-# this function uses the filtered dataframe to generate the line chart
-def get_line_chart(df_customer,selected_resolution):
-    df_customer.set_index('approval_date', inplace=True)
-    graph_data = df_customer.resample('1M').sum()
-
-    if selected_resolution == 'Sum Yearly':
-        graph_data = df_customer.resample('1Y').sum()
-
-    elif selected_resolution == 'Sum Quarterly':
-        graph_data = df_customer.resample('3M').sum()
-
-
-    elif selected_resolution == 'Sum Monthly':
-        graph_data = df_customer.resample('1M').sum()
-
-    elif selected_resolution == 'Sum Daily':
-        graph_data = df_customer.resample('1D').sum()
+# the resample rule of every resolution of the line chart
+line_chart_rules = OrderedDict([('Sum Daily', '1D'), ('Sum Monthly', '1M'), ('Sum Quarterly', '3M'), ('Sum Yearly', '1Y')])
+
+
+# this function builds the sums of the two values columns at all the line chart resolutions at once ,
+# the daily sums are taken from the rows and every other resolution is summed from the daily ones ,
+# so switching the resolution is only a lookup in the returned dict
+def get_line_chart_pyramid(df_customer):
+    # not changing df_customer in place since it can be shared with the other cards through the slice cache ,
+    # and only the two values columns are summed
+    values = df_customer.set_index('approval_date')[['transaction_value','deposited_value']]
+    daily = values.resample('1D').sum()
+    pyramid = {'Sum Daily': daily}
+    for resolution, rule in line_chart_rules.items():
+        if resolution != 'Sum Daily':
+            # rounding the sums of sums so the float noise doesn't change the int values shown on the chart
+            pyramid[resolution] = daily.resample(rule).sum().round(2)
+    return pyramid
+
+
+# returning the sums of the selected resolution , the monthly ones are used when no resolution is selected
+def get_line_chart_data(pyramid, selected_resolution):
+    return pyramid.get(selected_resolution, pyramid['Sum Monthly'])
+
+
+# this function returns the daily sums of the pyramid in a compact columnar form for the browser , the days are
+# contiguous so only the first date is sent , the other resolutions are summed from it by assets/line_chart.js
+def get_line_chart_series(pyramid):
+    daily = pyramid['Sum Daily']
+    if len(daily) == 0:
+        return None
+    return dict(start=daily.index[0].strftime('%Y-%m-%d'),
+                transactions=daily['transaction_value'].round(2).tolist(),
+                deposits=daily['deposited_value'].round(2).tolist())
+
+
+# this function returns the positions of the points kept when y is downsampled to threshold points with the largest
+# triangle three buckets algorithm , the first and the last points are always kept and every bucket between them
+# keeps the point making the largest triangle with the point kept before it and the average of the next bucket
+def get_lttb_indices(x,y,threshold):
+    points_count=len(y)
+    if threshold>=points_count or threshold<3:
+        return np.arange(points_count)
+
+    x=np.asarray(x,dtype='float64')
+    y=np.asarray(y,dtype='float64')
+    # the buckets starts , the first and the last points are buckets of their own
+    starts=(np.floor(np.arange(threshold-1)*(points_count-2)/(threshold-2))+1).astype('int64')
+    ends=np.append(starts[1:],points_count)
+
+    indices=np.empty(threshold,dtype='int64')
+    indices[0]=0
+    indices[-1]=points_count-1
+    kept=0
+    for bucket in range(threshold-2):
+        start,end=starts[bucket],ends[bucket]
+        next_start,next_end=starts[bucket+1],ends[bucket+1]
+        average_x=x[next_start:next_end].mean()
+        average_y=y[next_start:next_end].mean()
+        areas=np.abs((x[kept]-average_x)*(y[start:end]-y[kept])-(x[kept]-x[start:end])*(average_y-y[kept]))
+        kept=start+int(np.argmax(areas))
+        indices[bucket+1]=kept
+    return indices
+
+
+# returning the ( dates , values ) of the two line chart traces and the markers mode , with max_points every trace is
+# downsampled to at most max_points points by get_lttb_indices , and only the points inside date_range ( start , end )
+# are used when it is given ( with one more point on each side so the lines reach the borders of the chart )
+def get_line_chart_traces(graph_data,max_points=None,date_range=None):
+    marker_mode='lines'
+    if len(graph_data.index.unique()) ==1:
+        marker_mode='markers'
 
+    if date_range is not None:
+        start=graph_data.index.searchsorted(pd.Timestamp(date_range[0]),side='left')
+        end=graph_data.index.searchsorted(pd.Timestamp(date_range[1]),side='right')
+        graph_data=graph_data.iloc[max(start-1,0):end+1]
+
+    traces=[]
+    for column in ['transaction_value','deposited_value']:
+        x,y=graph_data.index,graph_data[column].astype('int64')
+        if max_points:
+            indices=get_lttb_indices(x.asi8,y.to_numpy(),max_points)
+            x,y=x[indices],y.iloc[indices]
+        traces.append((x,y))
+    return traces,marker_mode
+
+
+# this function returns the changes of the line chart figure for new sums , only the values of the two traces are
+# sent and the zoom is reset ( or set to date_range ) , the layout of the figure already shown stays the same
+def get_line_chart_patch(graph_data,max_points=None,date_range=None):
+    traces,marker_mode=get_line_chart_traces(graph_data,max_points,date_range)
+    patch=Patch()
+    for index,(x,values) in [(1,traces[0]),(2,traces[1])]:
+        patch['data'][index]['x']=x
+        patch['data'][index]['y']=values
+        patch['data'][index]['mode']=marker_mode
+    if date_range is not None:
+        patch['layout']['xaxis']['range']=list(date_range)
+        patch['layout']['xaxis']['autorange']=False
+    else:
+        patch['layout']['xaxis']['autorange']=True
+    patch['layout']['yaxis']['autorange']=True
+    return patch
 
 
+# this function generates the line chart from one resolution of the pyramid made by get_line_chart_pyramid ,
+# max_points and date_range are used like in get_line_chart_traces
+def get_line_chart(graph_data,max_points=None,date_range=None):
     line_fig = go.Figure(go.Scatter())
-    marker_mode='lines'
-    if len(graph_data.index.unique()) ==1:
-        marker_mode='markers'
+    traces,marker_mode=get_line_chart_traces(graph_data,max_points,date_range)
+    (transactions_x,transactions),(deposits_x,deposits)=traces
 
     line_fig.add_trace(
-        go.Scatter(x=graph_data.index, y=graph_data['transaction_value'].astype('int64'), mode=marker_mode, name='Transactions',
+        go.Scatter(x=transactions_x, y=transactions, mode=marker_mode, name='Transactions',
                    marker_color='#3B98F5'
                    # , stackgroup='one'
                    ))
 
     line_fig.add_trace(
-        go.Scatter(x=graph_data.index, y=graph_data['deposited_value'].astype('int64'), mode=marker_mode, name='Deposits',
+        go.Scatter(x=deposits_x, y=deposits, mode=marker_mode, name='Deposits',
                    marker_color='#1500FF'
                    # , stackgroup='one'
                    ))
@@ -183,6 +535,8 @@ def get_line_chart(df_customer,selected_resolution):
     )
     line_fig.update_xaxes(showgrid=False, showline=True, zeroline=False, linecolor='black')
     line_fig.update_yaxes(showgrid=False, showline=True, zeroline=False, linecolor='black')
+    if date_range is not None:
+        line_fig.update_xaxes(range=list(date_range))
 
     line_fig_div =dcc.Graph(id='line_chart',
                   config={'displayModeBar': True, 'displaylogo': False, 'modeBarButtonsToRemove': ['lasso2d', 'pan']},
@@ -192,14 +546,48 @@ def get_line_chart(df_customer,selected_resolution):
 
     return (line_fig_div,line_fig)
 
-# this function uses the filtered dataframe to generate the histogram chart
-def get_operations_hist(df_customer):
-
-
+# the bin widths tried for the histogram from the smallest to the biggest , as ( numpy date unit , units per bin )
+hist_bin_widths=[('D',1),('D',2),('D',7),('D',14),('M',1),('M',3),('M',6),('Y',1),('Y',5)]
+
+# this function counts the dates in bins on the server , the smallest width of hist_bin_widths giving at most
+# max_bins bins between the first and the last date is used , only the dates inside date_range ( start , end ) are
+# counted when it is given , it returns the bins starts , the bins widths in milliseconds and the counts
+def get_hist_bins(dates,max_bins=100,date_range=None):
+    dates=np.asarray(dates,dtype='datetime64[ns]')
+    dates=dates[~np.isnat(dates)]
+    if date_range is not None:
+        start,end=np.datetime64(pd.Timestamp(date_range[0]),'ns'),np.datetime64(pd.Timestamp(date_range[1]),'ns')
+        dates=dates[(dates>=start)&(dates<=end)]
+    if len(dates)==0:
+        return np.array([],dtype='datetime64[ms]'),np.array([],dtype='int64'),np.array([],dtype='int64')
+
+    for unit,step in hist_bin_widths:
+        positions=dates.astype('datetime64[{}]'.format(unit)).astype('int64')//step
+        first=positions.min()
+        bins_count=positions.max()-first+1
+        if bins_count<=max_bins:
+            break
+
+    counts=np.bincount(positions-first,minlength=bins_count)
+    edges=((first+np.arange(bins_count+1))*step).astype('datetime64[{}]'.format(unit)).astype('datetime64[ms]')
+    widths=np.diff(edges).astype('int64')
+    return edges[:-1],widths,counts
+
+
+# this function generates the histogram figure , with server_bins the dates are counted on the server by get_hist_bins
+# and only the bins are sent , date_range is the zoomed range of the x axis that is binned at a smaller width ,
+# without server_bins all the dates are sent and binned in the browser like before
+def get_operations_hist_figure(df_customer,server_bins=False,date_range=None,max_bins=100):
     hist_fig = go.Figure(go.Histogram())
 
-    hist_fig.add_trace(go.Histogram(name='', x=df_customer['approval_date'].to_list(), showlegend=False,
-                                    marker_color='#00bfff'))
+    if server_bins:
+        starts,widths,counts=get_hist_bins(df_customer['approval_date'].to_numpy(),max_bins,date_range)
+        hist_fig.add_trace(go.Bar(name='', x=starts, y=counts, width=widths, offset=0, showlegend=False,
+                                  marker_color='#00bfff', marker_line_width=0,
+                                  hovertemplate='%{x|%Y-%m-%d}<br>%{y}<extra></extra>'))
+    else:
+        hist_fig.add_trace(go.Histogram(name='', x=df_customer['approval_date'].to_list(), showlegend=False,
+                                        marker_color='#00bfff'))
 
     hist_fig.update_layout(
             title='<b>Distribution of Operations over Time<b>', xaxis_title='<b>Date<b>',title_x=0.5,
@@ -213,293 +601,94 @@ def get_operations_hist(df_customer):
 
     )
 
+    if server_bins:
+        hist_fig.update_layout(bargap=0.1)
+        if date_range is not None and len(df_customer):
+            # keeping the zoomed range shown and the range slider over all the dates so it can be moved out of the zoom
+            all_dates=df_customer['approval_date']
+            hist_fig.update_xaxes(range=list(date_range),rangeslider_range=[all_dates.min(),all_dates.max()])
+
     hist_fig.update_xaxes(showgrid=False, showline=True, zeroline=False, linecolor='black')
     hist_fig.update_yaxes(showgrid=False, showline=True, zeroline=False, linecolor='black')
 
-    hist_div =dcc.Graph(id='operations_hist', config={'displayModeBar': True, 'scrollZoom': True, 'displaylogo': False,
-                                                      'modeBarButtonsToRemove': ['zoom', 'pan','autoScale','lasso2d']},
-                        className='hist-fig',
-                  style=dict(height='', backgroundColor='white'), figure=hist_fig
-                  )
-
-    return hist_div
-
-# this function uses the filtered dataframe to update all the information in cards
-def get_indicators_figures(df_customer,selected_customer,selected_bank,selected_sector,selected_year):
-
-
-    if selected_sector=='All Sectors' and selected_bank=='All Banks' and selected_year=='All Years':
-        filtered_trans_value=int(df_customer['transaction_value'].sum())
-        filtered_dep_value = int(df_customer['deposited_value'].sum())
-        filtered_ratej_value = df_customer['rate_JUCAS'].mean()
-        filtered_rateb_value = df_customer['rate_bank'].mean()
-        filtered_time_amor_value = int(df_customer['time_amortization'].mean())
-        to_be_paid_value = int(df_customer['to_be_paid'].sum())
-        op_count_value = int(df_customer['ide'].count())
-
-
-
-    elif selected_sector == 'All Sectors' and selected_bank != 'All Banks' and selected_year != 'All Years':
-        groupby_list=['bank_name','Year']
-        customer_sum_tans_df = df_customer.groupby(groupby_list)['transaction_value'].sum().reset_index()
-        customer_sum_dep_df = df_customer.groupby(groupby_list)['deposited_value'].sum().reset_index()
-        customer_avg_ratej_df = df_customer.groupby(groupby_list)['rate_JUCAS'].mean().reset_index()
-        customer_avg_rateb_df = df_customer.groupby(groupby_list)['rate_bank'].mean().reset_index()
-        customer_time_amor_df = df_customer.groupby(groupby_list)['time_amortization'].mean().reset_index()
-        to_be_paid_df = df_customer.groupby(groupby_list)['to_be_paid'].sum().reset_index()
-        op_count_df = df_customer.groupby(groupby_list)['ide'].count().reset_index()
-
-
-        filtered_trans_value = customer_sum_tans_df[(customer_sum_tans_df['bank_name'] == selected_bank) &
-                                                    (customer_sum_tans_df['Year'] == selected_year)]
-        filtered_trans_value = int(filtered_trans_value['transaction_value'].values[0])
-
-        filtered_dep_value = customer_sum_dep_df[(customer_sum_dep_df['bank_name'] == selected_bank) &
-                                                    (customer_sum_dep_df['Year'] == selected_year)]
-        filtered_dep_value = int(filtered_dep_value['deposited_value'].values[0])
-
-        filtered_ratej_value = customer_avg_ratej_df[(customer_avg_ratej_df['bank_name'] == selected_bank) &
-                                                    (customer_avg_ratej_df['Year'] == selected_year)]
-        filtered_ratej_value = filtered_ratej_value['rate_JUCAS'].values[0]
-
-        filtered_rateb_value = customer_avg_rateb_df[(customer_avg_rateb_df['bank_name'] == selected_bank) &
-                                                    (customer_avg_rateb_df['Year'] == selected_year)]
-        filtered_rateb_value = filtered_rateb_value['rate_bank'].values[0]
-
-        filtered_time_amor_value = customer_time_amor_df[(customer_time_amor_df['bank_name'] == selected_bank) &
-                                                    (customer_time_amor_df['Year'] == selected_year)]
-        filtered_time_amor_value = int(filtered_time_amor_value['time_amortization'].values[0])
-
-        to_be_paid_value = to_be_paid_df[(to_be_paid_df['bank_name'] == selected_bank) &
-                                                    (to_be_paid_df['Year'] == selected_year)]
-        to_be_paid_value = int(to_be_paid_value['to_be_paid'].values[0])
-
-        op_count_value = op_count_df[(op_count_df['bank_name'] == selected_bank) &
-                                                    (op_count_df['Year'] == selected_year)]
-        op_count_value = int(op_count_value['ide'].values[0])
+    return hist_fig
 
-    elif selected_sector == 'All Sectors' and selected_bank == 'All Banks' and selected_year != 'All Years':
-        groupby_list=['Year']
-        customer_sum_tans_df = df_customer.groupby(groupby_list)['transaction_value'].sum().reset_index()
-        customer_sum_dep_df = df_customer.groupby(groupby_list)['deposited_value'].sum().reset_index()
-        customer_avg_ratej_df = df_customer.groupby(groupby_list)['rate_JUCAS'].mean().reset_index()
-        customer_avg_rateb_df = df_customer.groupby(groupby_list)['rate_bank'].mean().reset_index()
-        customer_time_amor_df = df_customer.groupby(groupby_list)['time_amortization'].mean().reset_index()
-        to_be_paid_df = df_customer.groupby(groupby_list)['to_be_paid'].sum().reset_index()
-        op_count_df = df_customer.groupby(groupby_list)['ide'].count().reset_index()
-
-
-        filtered_trans_value = customer_sum_tans_df[
-                                                    (customer_sum_tans_df['Year'] == selected_year)]
-        filtered_trans_value = int(filtered_trans_value['transaction_value'].values[0])
-
-        filtered_dep_value = customer_sum_dep_df[
-                                                    (customer_sum_dep_df['Year'] == selected_year)]
-        filtered_dep_value = int(filtered_dep_value['deposited_value'].values[0])
-
-        filtered_ratej_value = customer_avg_ratej_df[
-                                                    (customer_avg_ratej_df['Year'] == selected_year)]
-        filtered_ratej_value = filtered_ratej_value['rate_JUCAS'].values[0]
-
-        filtered_rateb_value = customer_avg_rateb_df[
-                                                    (customer_avg_rateb_df['Year'] == selected_year)]
-        filtered_rateb_value = filtered_rateb_value['rate_bank'].values[0]
-
-        filtered_time_amor_value = customer_time_amor_df[
-                                                    (customer_time_amor_df['Year'] == selected_year)]
-        filtered_time_amor_value = int(filtered_time_amor_value['time_amortization'].values[0])
-
-        to_be_paid_value = to_be_paid_df[
-                                                    (to_be_paid_df['Year'] == selected_year)]
-        to_be_paid_value = int(to_be_paid_value['to_be_paid'].values[0])
-
-        op_count_value = op_count_df[
-                                                    (op_count_df['Year'] == selected_year)]
-        op_count_value = int(op_count_value['ide'].values[0])
-
-    elif selected_sector == 'All Sectors' and selected_bank != 'All Banks' and selected_year == 'All Years':
-        groupby_list=['bank_name']
-        customer_sum_tans_df = df_customer.groupby(groupby_list)['transaction_value'].sum().reset_index()
-        customer_sum_dep_df = df_customer.groupby(groupby_list)['deposited_value'].sum().reset_index()
-        customer_avg_ratej_df = df_customer.groupby(groupby_list)['rate_JUCAS'].mean().reset_index()
-        customer_avg_rateb_df = df_customer.groupby(groupby_list)['rate_bank'].mean().reset_index()
-        customer_time_amor_df = df_customer.groupby(groupby_list)['time_amortization'].mean().reset_index()
-        to_be_paid_df = df_customer.groupby(groupby_list)['to_be_paid'].sum().reset_index()
-        op_count_df = df_customer.groupby(groupby_list)['ide'].count().reset_index()
-
-
-        filtered_trans_value = customer_sum_tans_df[(customer_sum_tans_df['bank_name'] == selected_bank)]
-        filtered_trans_value = int(filtered_trans_value['transaction_value'].values[0])
-
-        filtered_dep_value = customer_sum_dep_df[(customer_sum_dep_df['bank_name'] == selected_bank) ]
-        filtered_dep_value = int(filtered_dep_value['deposited_value'].values[0])
-
-        filtered_ratej_value = customer_avg_ratej_df[(customer_avg_ratej_df['bank_name'] == selected_bank) ]
-        filtered_ratej_value = filtered_ratej_value['rate_JUCAS'].values[0]
-
-        filtered_rateb_value = customer_avg_rateb_df[(customer_avg_rateb_df['bank_name'] == selected_bank) ]
-        filtered_rateb_value = filtered_rateb_value['rate_bank'].values[0]
-
-        filtered_time_amor_value = customer_time_amor_df[(customer_time_amor_df['bank_name'] == selected_bank) ]
-        filtered_time_amor_value = int(filtered_time_amor_value['time_amortization'].values[0])
-
-        to_be_paid_value = to_be_paid_df[(to_be_paid_df['bank_name'] == selected_bank) ]
-        to_be_paid_value = int(to_be_paid_value['to_be_paid'].values[0])
-
-        op_count_value = op_count_df[(op_count_df['bank_name'] == selected_bank) ]
-        op_count_value = int(op_count_value['ide'].values[0])
-
-    elif selected_sector != 'All Sectors' and selected_bank == 'All Banks' and selected_year == 'All Years':
-        groupby_list=['sector_name4']
-        customer_sum_tans_df = df_customer.groupby(groupby_list)['transaction_value'].sum().reset_index()
-        customer_sum_dep_df = df_customer.groupby(groupby_list)['deposited_value'].sum().reset_index()
-        customer_avg_ratej_df = df_customer.groupby(groupby_list)['rate_JUCAS'].mean().reset_index()
-        customer_avg_rateb_df = df_customer.groupby(groupby_list)['rate_bank'].mean().reset_index()
-        customer_time_amor_df = df_customer.groupby(groupby_list)['time_amortization'].mean().reset_index()
-        to_be_paid_df = df_customer.groupby(groupby_list)['to_be_paid'].sum().reset_index()
-        op_count_df = df_customer.groupby(groupby_list)['ide'].count().reset_index()
-
-
-        filtered_trans_value = customer_sum_tans_df[(customer_sum_tans_df['sector_name4'] == selected_sector)]
-        filtered_trans_value = int(filtered_trans_value['transaction_value'].values[0])
-
-        filtered_dep_value = customer_sum_dep_df[(customer_sum_dep_df['sector_name4'] == selected_sector) ]
-        filtered_dep_value = int(filtered_dep_value['deposited_value'].values[0])
-
-        filtered_ratej_value = customer_avg_ratej_df[(customer_avg_ratej_df['sector_name4'] == selected_sector) ]
-        filtered_ratej_value = filtered_ratej_value['rate_JUCAS'].values[0]
-
-        filtered_rateb_value = customer_avg_rateb_df[(customer_avg_rateb_df['sector_name4'] == selected_sector) ]
-        filtered_rateb_value = filtered_rateb_value['rate_bank'].values[0]
-
-        filtered_time_amor_value = customer_time_amor_df[(customer_time_amor_df['sector_name4'] == selected_sector) ]
-        filtered_time_amor_value = int(filtered_time_amor_value['time_amortization'].values[0])
-
-        to_be_paid_value = to_be_paid_df[(to_be_paid_df['sector_name4'] == selected_sector) ]
-        to_be_paid_value = int(to_be_paid_value['to_be_paid'].values[0])
-
-        op_count_value = op_count_df[(op_count_df['sector_name4'] == selected_sector) ]
-        op_count_value = int(op_count_value['ide'].values[0])
-
-    elif selected_sector != 'All Sectors' and selected_bank == 'All Banks' and selected_year != 'All Years':
-        groupby_list=['sector_name4','Year']
-        customer_sum_tans_df = df_customer.groupby(groupby_list)['transaction_value'].sum().reset_index()
-        customer_sum_dep_df = df_customer.groupby(groupby_list)['deposited_value'].sum().reset_index()
-        customer_avg_ratej_df = df_customer.groupby(groupby_list)['rate_JUCAS'].mean().reset_index()
-        customer_avg_rateb_df = df_customer.groupby(groupby_list)['rate_bank'].mean().reset_index()
-        customer_time_amor_df = df_customer.groupby(groupby_list)['time_amortization'].mean().reset_index()
-        to_be_paid_df = df_customer.groupby(groupby_list)['to_be_paid'].sum().reset_index()
-        op_count_df = df_customer.groupby(groupby_list)['ide'].count().reset_index()
-
-
-        filtered_trans_value = customer_sum_tans_df[(customer_sum_tans_df['sector_name4'] == selected_sector) &
-                                                    (customer_sum_tans_df['Year'] == selected_year)]
-        filtered_trans_value = int(filtered_trans_value['transaction_value'].values[0])
-
-        filtered_dep_value = customer_sum_dep_df[(customer_sum_dep_df['sector_name4'] == selected_sector) &
-                                                    (customer_sum_dep_df['Year'] == selected_year)]
-        filtered_dep_value = int(filtered_dep_value['deposited_value'].values[0])
-
-        filtered_ratej_value = customer_avg_ratej_df[(customer_avg_ratej_df['sector_name4'] == selected_sector) &
-                                                    (customer_avg_ratej_df['Year'] == selected_year)]
-        filtered_ratej_value = filtered_ratej_value['rate_JUCAS'].values[0]
-
-        filtered_rateb_value = customer_avg_rateb_df[(customer_avg_rateb_df['sector_name4'] == selected_sector) &
-                                                    (customer_avg_rateb_df['Year'] == selected_year)]
-        filtered_rateb_value = filtered_rateb_value['rate_bank'].values[0]
-
-        filtered_time_amor_value = customer_time_amor_df[(customer_time_amor_df['sector_name4'] == selected_sector) &
-                                                    (customer_time_amor_df['Year'] == selected_year)]
-        filtered_time_amor_value = int(filtered_time_amor_value['time_amortization'].values[0])
-
-        to_be_paid_value = to_be_paid_df[(to_be_paid_df['sector_name4'] == selected_sector) &
-                                                    (to_be_paid_df['Year'] == selected_year)]
-        to_be_paid_value = int(to_be_paid_value['to_be_paid'].values[0])
-
-        op_count_value = op_count_df[(op_count_df['sector_name4'] == selected_sector) &
-                                                    (op_count_df['Year'] == selected_year)]
-        op_count_value = int(op_count_value['ide'].values[0])
-
-    elif selected_sector != 'All Sectors' and selected_bank != 'All Banks' and selected_year == 'All Years':
-        groupby_list = ['bank_name', 'sector_name4']
-        customer_sum_tans_df = df_customer.groupby(groupby_list)['transaction_value'].sum().reset_index()
-        customer_sum_dep_df = df_customer.groupby(groupby_list)['deposited_value'].sum().reset_index()
-        customer_avg_ratej_df = df_customer.groupby(groupby_list)['rate_JUCAS'].mean().reset_index()
-        customer_avg_rateb_df = df_customer.groupby(groupby_list)['rate_bank'].mean().reset_index()
-        customer_time_amor_df = df_customer.groupby(groupby_list)['time_amortization'].mean().reset_index()
-        to_be_paid_df = df_customer.groupby(groupby_list)['to_be_paid'].sum().reset_index()
-        op_count_df = df_customer.groupby(groupby_list)['ide'].count().reset_index()
-
-        filtered_trans_value = customer_sum_tans_df[(customer_sum_tans_df['bank_name'] == selected_bank) &
-                                                    (customer_sum_tans_df['sector_name4'] == selected_year)]
-        filtered_trans_value = int(filtered_trans_value['transaction_value'].values[0])
-
-        filtered_dep_value = customer_sum_dep_df[(customer_sum_dep_df['bank_name'] == selected_bank) &
-                                                 (customer_sum_dep_df['sector_name4'] == selected_sector)]
-        filtered_dep_value = int(filtered_dep_value['deposited_value'].values[0])
-
-        filtered_ratej_value = customer_avg_ratej_df[(customer_avg_ratej_df['bank_name'] == selected_bank) &
-                                                     (customer_avg_ratej_df['sector_name4'] == selected_sector)]
-        filtered_ratej_value = filtered_ratej_value['rate_JUCAS'].values[0]
-
-        filtered_rateb_value = customer_avg_rateb_df[(customer_avg_rateb_df['bank_name'] == selected_bank) &
-                                                     (customer_avg_rateb_df['sector_name4'] == selected_sector)]
-        filtered_rateb_value = filtered_rateb_value['rate_bank'].values[0]
-
-        filtered_time_amor_value = customer_time_amor_df[(customer_time_amor_df['bank_name'] == selected_bank) &
-                                                         (customer_time_amor_df['sector_name4'] == selected_sector)]
-        filtered_time_amor_value = int(filtered_time_amor_value['time_amortization'].values[0])
-
-        to_be_paid_value = to_be_paid_df[(to_be_paid_df['bank_name'] == selected_bank) &
-                                         (to_be_paid_df['sector_name4'] == selected_sector)]
-        to_be_paid_value = int(to_be_paid_value['to_be_paid'].values[0])
-
-        op_count_value = op_count_df[(op_count_df['bank_name'] == selected_bank) &
-                                     (op_count_df['sector_name4'] == selected_sector)]
-        op_count_value = int(op_count_value['ide'].values[0])
 
+# this function returns the changes of the histogram figure for new dates or a new zoomed range , only the bins
+# ( or the dates without server_bins ) and the x axis range are sent , the layout already shown stays the same
+def get_operations_hist_patch(df_customer,server_bins=False,date_range=None,max_bins=100):
+    patch=Patch()
+    if server_bins:
+        starts,widths,counts=get_hist_bins(df_customer['approval_date'].to_numpy(),max_bins,date_range)
+        patch['data'][1]['x']=starts
+        patch['data'][1]['y']=counts
+        patch['data'][1]['width']=widths
     else:
-        groupby_list = ['bank_name', 'sector_name4','Year']
-        customer_sum_tans_df = df_customer.groupby(groupby_list)['transaction_value'].sum().reset_index()
-        customer_sum_dep_df = df_customer.groupby(groupby_list)['deposited_value'].sum().reset_index()
-        customer_avg_ratej_df = df_customer.groupby(groupby_list)['rate_JUCAS'].mean().reset_index()
-        customer_avg_rateb_df = df_customer.groupby(groupby_list)['rate_bank'].mean().reset_index()
-        customer_time_amor_df = df_customer.groupby(groupby_list)['time_amortization'].mean().reset_index()
-        to_be_paid_df = df_customer.groupby(groupby_list)['to_be_paid'].sum().reset_index()
-        op_count_df = df_customer.groupby(groupby_list)['ide'].count().reset_index()
-
-        filtered_trans_value = customer_sum_tans_df[(customer_sum_tans_df['bank_name'] == selected_bank) &
-                                                    (customer_sum_tans_df['sector_name4'] == selected_year) & (customer_sum_tans_df['Year'] == selected_year)]
-        filtered_trans_value = int(filtered_trans_value['transaction_value'].values[0])
-
-        filtered_dep_value = customer_sum_dep_df[(customer_sum_dep_df['bank_name'] == selected_bank) &
-                                                 (customer_sum_dep_df['sector_name4'] == selected_sector) & (customer_sum_dep_df['Year'] == selected_year)]
-        filtered_dep_value = int(filtered_dep_value['deposited_value'].values[0])
-
-        filtered_ratej_value = customer_avg_ratej_df[(customer_avg_ratej_df['bank_name'] == selected_bank) &
-                                                     (customer_avg_ratej_df['sector_name4'] == selected_sector) & (customer_avg_ratej_df['Year'] == selected_year)]
-        filtered_ratej_value = filtered_ratej_value['rate_JUCAS'].values[0]
-
-        filtered_rateb_value = customer_avg_rateb_df[(customer_avg_rateb_df['bank_name'] == selected_bank) &
-                                                     (customer_avg_rateb_df['sector_name4'] == selected_sector) & (customer_avg_rateb_df['Year'] == selected_year)]
-        filtered_rateb_value = filtered_rateb_value['rate_bank'].values[0]
-
-        filtered_time_amor_value = customer_time_amor_df[(customer_time_amor_df['bank_name'] == selected_bank) &
-                                                         (customer_time_amor_df['sector_name4'] == selected_sector) & (customer_time_amor_df['Year'] == selected_year)]
-        filtered_time_amor_value = int(filtered_time_amor_value['time_amortization'].values[0])
-
-        to_be_paid_value = to_be_paid_df[(to_be_paid_df['bank_name'] == selected_bank) &
-                                         (to_be_paid_df['sector_name4'] == selected_sector) & (to_be_paid_df['Year'] == selected_year)]
-        to_be_paid_value = int(to_be_paid_value['to_be_paid'].values[0])
+        patch['data'][1]['x']=df_customer['approval_date'].to_list()
+
+    if date_range is not None and len(df_customer):
+        all_dates=df_customer['approval_date']
+        patch['layout']['xaxis']['range']=list(date_range)
+        patch['layout']['xaxis']['autorange']=False
+        patch['layout']['xaxis']['rangeslider']['range']=[all_dates.min(),all_dates.max()]
+        patch['layout']['xaxis']['rangeslider']['autorange']=False
+    else:
+        patch['layout']['xaxis']['autorange']=True
+        patch['layout']['xaxis']['rangeslider']['autorange']=True
+    patch['layout']['yaxis']['autorange']=True
+    return patch
 
-        op_count_value = op_count_df[(op_count_df['bank_name'] == selected_bank) &
-                                     (op_count_df['sector_name4'] == selected_sector) & (op_count_df['Year'] == selected_year)]
-        op_count_value = int(op_count_value['ide'].values[0])
 
+# this function uses the filtered dataframe to generate the histogram chart
+def get_operations_hist(df_customer,server_bins=False,max_bins=100):
+    hist_fig=get_operations_hist_figure(df_customer,server_bins,max_bins=max_bins)
 
+    hist_div =dcc.Graph(id='operations_hist', config={'displayModeBar': True, 'scrollZoom': True, 'displaylogo': False,
+                                                      'modeBarButtonsToRemove': ['zoom', 'pan','autoScale','lasso2d']},
+                        className='hist-fig',
+                  style=dict(height='', backgroundColor='white'), figure=hist_fig
+                  )
 
+    return hist_div
 
 
+# this function returns the x axis range of a relayoutData of a chart , ( None , False ) when the zoom is reset
+# and ( None , True ) when the x axis didn't change
+def get_relayout_x_range(relayout_data):
+    if not relayout_data:
+        return None,True
+    if relayout_data.get('xaxis.autorange'):
+        return None,False
+    if 'xaxis.range[0]' in relayout_data and 'xaxis.range[1]' in relayout_data:
+        return (relayout_data['xaxis.range[0]'],relayout_data['xaxis.range[1]']),False
+    if 'xaxis.range' in relayout_data:
+        return tuple(relayout_data['xaxis.range'][:2]),False
+    return None,True
+
+# the columns that are summed and the columns that are averaged in the information cards
+indicators_sum_columns=['transaction_value','deposited_value','to_be_paid']
+indicators_mean_columns=['rate_JUCAS','rate_bank','time_amortization']
+
+# this function turns the sums and the not empty values counts of the cards columns into the cards values
+def get_indicators_values_from_aggregates(sums,counts,op_count):
+    means=np.divide(sums,counts,out=np.zeros(len(sums)),where=counts>0)
+    return dict(trans_value=int(sums[0]),dep_value=int(sums[1]),to_be_paid_value=int(sums[2]),
+                ratej_value=means[3],rateb_value=means[4],time_amor_value=int(means[5]),op_count_value=int(op_count))
+
+# this function returns the cards columns as float64 values , the columns stored as float32 ( the ratings )
+# are rounded back to the values they had in the excel file
+def get_indicators_columns_values(df_customer):
+    return np.round(df_customer[indicators_sum_columns+indicators_mean_columns].to_numpy(dtype='float64'),6)
+
+# this function uses the cards values ( from the dataset cube ) to update all the information in cards
+def get_indicators_figures(values):
+    filtered_trans_value=values['trans_value']
+    filtered_dep_value=values['dep_value']
+    filtered_ratej_value=values['ratej_value']
+    filtered_rateb_value=values['rateb_value']
+    filtered_time_amor_value=values['time_amor_value']
+    to_be_paid_value=values['to_be_paid_value']
+    op_count_value=values['op_count_value']
 
     sum_trans_fig = go.Figure()
 
@@ -602,3 +791,14 @@ def get_indicators_figures(df_customer,selected_customer,selected_bank,selected_
 
     return (sum_trans_fig,sum_dep_fig,avg_ratej_fig,avg_rateb_fig,avg_time_fig,to_be_paid_fig,op_count_fig)
 
+
+# this function returns the changes of the 7 indicators figures ( in the same order as get_indicators_figures ) ,
+# only the numbers are sent , the style of the figures already shown stays the same
+def get_indicators_patches(values):
+    patches=[]
+    for key in ['trans_value','dep_value','ratej_value','rateb_value','time_amor_value','to_be_paid_value','op_count_value']:
+        patch=Patch()
+        patch['data'][0]['value']=values[key]
+        patches.append(patch)
+    return tuple(patches)
+
@@ -0,0 +1,131 @@
+import os
+import sys
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from fpdf import FPDF
+import Database
+import Functions
+
+# getting the local directory of the app , the database is read from it like in main.py
+THIS_FOLDER = os.path.dirname(os.path.abspath(__file__))
+excel_file = os.path.join(THIS_FOLDER, 'databse.xlsx')
+
+# the reports made for every customer , the same files as the dashboard pdf and excel downloads
+report_formats = ['pdf', 'xlsx']
+
+
+def get_report_path(folder, customer_id, report_format):
+    return os.path.join(folder, '{}.{}'.format(customer_id, report_format))
+
+
+# this function writes a report file with write ( called with the path to write ) under a temporary name , then
+# renames it , so a report file that exists is always complete even when the batch was stopped while writing it
+def write_report(path, write):
+    name, extension = os.path.splitext(path)
+    temporary_path = name + '.part' + extension
+    write(temporary_path)
+    os.replace(temporary_path, path)
+
+
+def write_pdf_report(dataset, customer_id, path):
+    # the report of all the operations of the customer , with the cards values of 'All Banks' , 'All Sectors' and 'All Years'
+    df_customer = Functions.get_table_frame(dataset.get_customer_rows(customer_id)).reset_index(drop=True)
+    values = dataset.get_indicators(customer_id, Database.all_banks, Database.all_sectors, Database.all_years)
+    pdf_content = Functions.generate_pdf_report(df_customer, FPDF(format='letter', unit='in'),
+                                                dataset.get_customer_name(customer_id), customer_id,
+                                                *Functions.get_pdf_report_texts(values))
+
+    def write(temporary_path):
+        with open(temporary_path, 'wb') as file:
+            file.write(pdf_content)
+    write_report(path, write)
+
+
+# the same file as the excel export of the dashboard , written chunk by chunk from the rows of the customer only
+def write_excel_report(customer_id, path):
+    write_report(path, lambda temporary_path: Database.write_excel_export(
+        Database.iter_customer_export_chunks(excel_file, customer_id), temporary_path))
+
+
+# this function makes the missing reports of one customer in a worker process and returns the formats written
+def make_customer_reports(customer_id, folder, formats, overwrite=False):
+    dataset = Database.get_dataset()
+    written = []
+    for report_format in formats:
+        path = get_report_path(folder, customer_id, report_format)
+        if os.path.exists(path) and not overwrite:
+            continue
+        if report_format == 'pdf':
+            write_pdf_report(dataset, customer_id, path)
+        else:
+            write_excel_report(customer_id, path)
+        written.append(report_format)
+    return written
+
+
+# the workers started with fork already have the dataset loaded by the main process ( shared copy on write ) ,
+# the ones started with spawn load it once when they start
+def init_worker(database_file):
+    if Database.get_dataset() is None:
+        Database.load_dataset(database_file)
+
+
+# this function returns the customers of the batch , all of them or only the given ones , without the customers that
+# already have all their reports ( so a stopped batch continues where it stopped )
+def get_batch_customers(dataset, folder, formats, customers=None, overwrite=False):
+    customers_ids = list(dataset.customers_ids)
+    if customers:
+        known_customers = set(customers_ids)
+        for customer_id in customers:
+            if customer_id not in known_customers:
+                print('unknown customer id {}'.format(customer_id))
+        customers_ids = [customer_id for customer_id in customers if customer_id in known_customers]
+
+    if overwrite:
+        return customers_ids
+    return [customer_id for customer_id in customers_ids
+            if not all(os.path.exists(get_report_path(folder, customer_id, report_format)) for report_format in formats)]
+
+
+def run_batch(folder, formats, customers=None, workers=None, overwrite=False):
+    os.makedirs(folder, exist_ok=True)
+    dataset = Database.load_dataset(excel_file)
+    batch_customers = get_batch_customers(dataset, folder, formats, customers, overwrite)
+    print('{} customers to report in {}'.format(len(batch_customers), folder))
+
+    # forking the workers after the dataset is loaded so they don't load it again
+    mp_context = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else None
+    failed = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context,
+                             initializer=init_worker, initargs=(excel_file,)) as executor:
+        futures = {executor.submit(make_customer_reports, customer_id, folder, formats, overwrite): customer_id
+                   for customer_id in batch_customers}
+        for done, future in enumerate(as_completed(futures), start=1):
+            customer_id = futures[future]
+            try:
+                written = future.result()
+            except Exception as error:
+                failed.append(customer_id)
+                print('[{}/{}] {} failed : {!r}'.format(done, len(futures), customer_id, error))
+                continue
+            print('[{}/{}] {} {}'.format(done, len(futures), customer_id, ' '.join(written) or 'already done'))
+
+    print('done in {:.1f} s , {} failed'.format(time.perf_counter() - start, len(failed)))
+    return failed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Writes the pdf report and the excel data of every customer ( or of the '
+                                                 'given ones ) , the customers already reported in the folder are skipped')
+    parser.add_argument('folder', help='folder where the reports are written')
+    parser.add_argument('--customers', nargs='+', help='customers ids to report , all the customers when not given')
+    parser.add_argument('--formats', nargs='+', choices=report_formats, default=report_formats, help='reports to write')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes , the number of cpus by default')
+    parser.add_argument('--overwrite', action='store_true', help='write the reports again even if they exist')
+    args = parser.parse_args()
+
+    failed = run_batch(args.folder, args.formats, args.customers, args.workers, args.overwrite)
+    sys.exit(1 if failed else 0)
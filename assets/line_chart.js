@@ -0,0 +1,78 @@
+// the clientside functions of the line chart , dash loads every js file of the assets folder
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    line_chart: {
+        // this function sums the daily series sent by the server to the selected resolution and updates the
+        // line chart figure in the browser , the bins are the same as the pandas resample used on the server
+        update_resolution: function (selected_resolution, series, figure) {
+            if (!series || !figure || !figure.data || figure.data.length < 3) {
+                return window.dash_clientside.no_update;
+            }
+
+            // the number of months summed in one bin , 0 for the daily sums
+            var months = {'Sum Yearly': 12, 'Sum Quarterly': 3, 'Sum Monthly': 1, 'Sum Daily': 0}[selected_resolution];
+            if (months === undefined) {
+                months = 1;
+            }
+
+            var start = new Date(series.start + 'T00:00:00Z');
+            var first_month = start.getUTCFullYear() * 12 + start.getUTCMonth();
+            var dates = [];
+            var transactions = [];
+            var deposits = [];
+
+            for (var i = 0; i < series.transactions.length; i++) {
+                var day = new Date(start.getTime() + i * 86400000);
+                var label;
+                if (months === 0) {
+                    label = day.toISOString().slice(0, 10);
+                } else {
+                    var month = day.getUTCFullYear() * 12 + day.getUTCMonth();
+                    var bin_month;
+                    if (months === 12) {
+                        // the yearly bins end at the end of every year
+                        bin_month = day.getUTCFullYear() * 12 + 11;
+                    } else {
+                        // the other bins end at the end of a month , counted from the first month of the series
+                        bin_month = first_month + Math.ceil((month - first_month) / months) * months;
+                    }
+                    // the day 0 of the next month is the last day of the bin month
+                    label = new Date(Date.UTC(Math.floor(bin_month / 12), bin_month % 12 + 1, 0)).toISOString().slice(0, 10);
+                }
+
+                if (dates.length === 0 || dates[dates.length - 1] !== label) {
+                    dates.push(label);
+                    transactions.push(0);
+                    deposits.push(0);
+                }
+                transactions[transactions.length - 1] += series.transactions[i];
+                deposits[deposits.length - 1] += series.deposits[i];
+            }
+
+            // the values are shown as integers like on the server
+            var to_int = function (value) {
+                return Math.trunc(Math.round(value * 100) / 100);
+            };
+            var marker_mode = dates.length === 1 ? 'markers' : 'lines';
+
+            var new_figure = Object.assign({}, figure);
+            new_figure.data = figure.data.slice();
+            new_figure.data[1] = Object.assign({}, figure.data[1], {x: dates, y: transactions.map(to_int), mode: marker_mode});
+            new_figure.data[2] = Object.assign({}, figure.data[2], {x: dates, y: deposits.map(to_int), mode: marker_mode});
+            // a zoom made at the old resolution is not kept
+            new_figure.layout = Object.assign({}, figure.layout, {
+                xaxis: Object.assign({}, (figure.layout || {}).xaxis, {autorange: true}),
+                yaxis: Object.assign({}, (figure.layout || {}).yaxis, {autorange: true})
+            });
+            return new_figure;
+        },
+
+        // this function returns the width of the line chart in pixels , used by the server to downsample the traces
+        get_width: function (relayout_data) {
+            var graph = document.getElementById('line_chart');
+            if (!graph || !graph.offsetWidth) {
+                return window.dash_clientside.no_update;
+            }
+            return graph.offsetWidth;
+        }
+    }
+});
@@ -1,21 +1,50 @@
 import time
 import os
+import hmac
+from concurrent.futures import ThreadPoolExecutor
 import dash
 import pandas as pd
 import base64
 import plotly.express as px
 import plotly.graph_objects as go
-from flask import Flask
+import plotly.io as pio
+from flask import Flask, Response, jsonify, request, abort
 import io
-from dash import Dash, Input, Output, dash_table, callback_context, State
+from dash import Dash, Input, Output, dash_table, callback_context, State, ClientsideFunction, DiskcacheManager
 import dash_bootstrap_components as dbc
 from dash import dcc, html
 from dash.exceptions import PreventUpdate
 import Functions
+import Database
 from collections import OrderedDict
 from dash.dcc import Download, send_data_frame
 from fpdf import FPDF
 
+# flask-compress is needed to compress the responses , without it they are sent as they are
+try:
+    from flask_compress import Compress
+    compress_available = True
+except ImportError:
+    compress_available = False
+
+# diskcache ( with multiprocess and psutil ) is needed to generate the pdf reports in background processes ,
+# without it the reports are generated inside the callback
+try:
+    import diskcache
+    import multiprocess
+    import psutil
+    background_available = True
+except ImportError:
+    background_available = False
+
+# orjson is the fast json encoder used for the callbacks responses ( it handles numpy arrays and dates by itself ) ,
+# without it the default json encoder of plotly is used
+try:
+    import orjson
+    orjson_available = True
+except ImportError:
+    orjson_available = False
+
 # defining server object
 server = Flask(__name__)
 
@@ -54,6 +83,85 @@ base_colors={ 'color1': '#EBECF0', 'color2': '#F5F5F5','color3': '#0f70e0'}
 # setting a font size that is used in some parts of the app layout
 text_font_size='1.5vh'
 
+# when True the customer table only receives the rows of the page that is shown , the paging , sorting and filtering
+# of the table are done on the server , when False the whole filtered dataframe is sent to the browser like before
+table_custom_paging=True
+
+# where the database rows are kept , 'pandas' keeps them in a dataframe in the memory of every worker , 'sqlite' ingests
+# the excel file once into a sqlite file ( in the snapshot folder ) shared by all the workers , the filters and the cards
+# aggregates are then indexed sql queries and only the rows of the slices shown are read
+storage_backend='pandas'
+
+# how often ( in seconds ) the excel file is checked for changes to reload the database , None to not watch it
+database_watch_interval=10
+
+# the token needed by the /admin/reload route , the route is disabled when it is not set
+admin_token=os.environ.get('DASHBOARD_ADMIN_TOKEN')
+
+# when True the Apply Filters button triggers one callback that filters once and builds all the cards in parallel ,
+# when False every card has its own callback like before
+single_apply_callback=True
+
+# when True the customer id dropdown starts with only the selected customer and its options are searched on the server
+# ( by customer id or customer name ) while typing , returning at most customer_search_results options ,
+# when False all the customers ids are sent in the page like before
+customer_search_on_server=True
+customer_search_results=20
+
+# when True the daily sums of the line chart are sent once with the chart and the date resolution is changed in the
+# browser ( assets/line_chart.js ) without calling the server , when False every resolution change calls the server
+line_chart_clientside=True
+
+# when True the line chart traces are downsampled ( largest triangle three buckets ) to one point per pixel of the chart
+# width ( line_chart_default_width until the browser sends it ) , zooming the chart sends the points of the zoomed range
+# again with more details , the resolution is then changed on the server since the browser doesn't get the daily sums
+line_chart_downsampling=False
+line_chart_default_width=1000
+
+# when True the histogram dates are counted in bins on the server and only the bins ( at most hist_max_bins ) are sent ,
+# zooming the histogram counts the zoomed dates again at a smaller bin width , when False all the dates are sent
+# and binned in the browser like before
+hist_server_bins=True
+hist_max_bins=100
+
+# when True the charts are in the layout from the start and the callbacks only send the changed parts of their figures
+# ( the traces values , with dash Patch ) , when False every figure is built again and sent as a whole like before
+figure_patch_updates=True
+
+# the json encoder of the callbacks responses ( figures and table rows ) , 'orjson' or 'json'
+json_engine='orjson'
+
+# when True the callbacks responses ( and the other files served ) bigger than response_compression_min_size bytes
+# are compressed with brotli or gzip , depending on what the browser accepts
+response_compression=True
+response_compression_min_size=1024
+
+# when True the customer data is downloaded from the /export route in the format chosen next to the button ( excel ,
+# csv or parquet ) , the file is written and sent in chunks of export_chunk_rows rows so big customers don't fill the
+# server memory , when False the excel file is built in memory by a callback like before
+export_streaming=True
+export_chunk_rows=10000
+
+if line_chart_downsampling:
+    line_chart_clientside=False
+
+# when True the pdf reports are generated by a background callback in another process ( the jobs are kept in the
+# pdf_jobs_cache folder ) while the page shows the progress , so the server stays free for the other callbacks ,
+# when False ( or without diskcache ) they are generated inside the callback
+pdf_background=True
+
+# dash encodes the callbacks responses with plotly , so its json engine is the one used
+pio.json.config.default_engine = json_engine if json_engine != 'orjson' or orjson_available else 'json'
+
+if response_compression and compress_available:
+    server.config.update(COMPRESS_ALGORITHM=['br', 'gzip'], COMPRESS_MIN_SIZE=response_compression_min_size)
+    Compress(server)
+
+if pdf_background and background_available:
+    background_manager=DiskcacheManager(diskcache.Cache(os.path.join(THIS_FOLDER,'pdf_jobs_cache')))
+else:
+    background_manager=None
+
 '''
 -------- Frontend Part --------
 '''
@@ -79,42 +187,33 @@ db_logo_img=dbc.Col([ logo_img] ,
         xs=dict(size=2,offset=0), sm=dict(size=2,offset=0),
         md=dict(size=2,offset=0), lg=dict(size=3,offset=0), xl=dict(size=3,offset=0))
 
-# reading the database into a dataframe
-dff=pd.read_excel(excel_file,sheet_name='data',engine='openpyxl')
-
-# taking only the columns we are interested in to reduce processing time
-df=dff[['ide','bank_name','customer_id','customer_name','transaction_value','deposited_value','to_be_paid','approval_date','sector_name4','rate_JUCAS','rate_bank','time_amortization']]
-
-# converting the type of customer_id column to string to be easier to work with
-df['customer_id']=df['customer_id'].astype(str)
-
-# converting the type of approval_date column to datetime to be able to use pandas datetime special functions
-df['approval_date']= pd.to_datetime(df['approval_date'],format="%d/%m/%Y")
-
-# creating a new column which contain only years from approval_date column
-df['Year'] = (pd.DatetimeIndex(df['approval_date']).year).astype(str)
+# reading the database into a dataframe with only the columns we are interested in ( in a compact form ) ,
+# it is loaded from the columnar snapshot next to the excel file as long as the excel file did not change ,
+# then the dataframe is indexed by customer so the rows of a customer are taken directly without scanning the whole dataframe
+dataset=Database.load_dataset(excel_file,storage_backend)
+print('database loaded : {}'.format(dataset.get_report()))
 
 # creating a list of all unique customers ids from the customer_id column
-customers_ids_list=df['customer_id'].unique()
+customers_ids_list=dataset.customers_ids
 
 # choosing the initial customer_id that we will show its data in the app startup
-df_customer=df[df['customer_id']==df['customer_id'][14] ]
-
-# creating a list of all unique banks names in the filtered customer dataframe from the bank_name column
-customer_banks_list=list( df_customer['bank_name'].unique() )
-
-# creating a list of all unique sectors names in the filtered customer dataframe from the sector_name4 column
-customer_sectors_list=list( df_customer['sector_name4'].unique() )
-
-# adding 'All Banks' and 'All Sectors' options in the created lists
-customer_banks_list.insert(0,'All Banks')
-customer_sectors_list.insert(0,'All Sectors')
-
-# creating a list of all unique years in the filtered customer dataframe
-df_customer['Year'] = (pd.DatetimeIndex(df_customer['approval_date']).year).astype(str)
-years=df_customer['Year'].to_list()
-years=list(OrderedDict.fromkeys(years))
-years.insert(0,'All Years')
+initial_customer=dataset.get_row_customer(14)
+
+# taking the lists of the banks names , sectors names and years of the initial customer from the dataset facets
+# and adding 'All Banks' , 'All Sectors' and 'All Years' options in them
+customer_facets=dataset.get_facets(initial_customer)
+customer_banks_list=['All Banks']+customer_facets['banks']
+customer_sectors_list=['All Sectors']+customer_facets['sectors']
+years=['All Years']+customer_facets['years']
+
+# the rows and the cards values of the initial customer , used to draw the charts in the layout when the figures are
+# patched by the callbacks ( the callbacks need the figures to be shown already )
+if figure_patch_updates:
+    initial_filters=(initial_customer,'All Banks','All Sectors','All Years')
+    initial_slice=dataset.get_slice(*initial_filters)
+    initial_figures=Functions.get_indicators_figures(dataset.get_indicators(*initial_filters))
+else:
+    initial_figures=[go.Figure() for i in range(7)]
 
 # adjusing the indicators ( info in blue cards ) sizes and colors
 indicator_size=22
@@ -129,7 +228,7 @@ sum_trans_text= html.Div(html.H1('Transactions Sum',className= 'info-header',
                             style=dict(display='', marginLeft='', textAlign="center", width='100%'))
 
 # initializing an empty figure where it will contain the Transactions Sum info ( number )
-sum_trans_fig=go.Figure()
+sum_trans_fig=initial_figures[0]
 sum_trans_indicator=html.Div(dcc.Graph(figure=sum_trans_fig,config={'displayModeBar': False},id='sum_trans_indicator',style=dict(width='100%')),className='num'
                            , style=dict(width='100%')  )
 
@@ -140,7 +239,7 @@ sum_dep_text= html.Div(html.H1('Deposits Sum',className= 'info-header',
                             style=dict(display='', marginLeft='', textAlign="center", width='100%'))
 
 # initializing an empty figure where it will contain the Deposit Sum info ( number )
-sum_dep_fig=go.Figure()
+sum_dep_fig=initial_figures[1]
 sum_dep_indicator=html.Div(dcc.Graph(figure=sum_dep_fig,config={'displayModeBar': False},id='sum_dep_indicator',style=dict(width='100%')),className='num'
                            , style=dict(width='100%')  )
 
@@ -151,7 +250,7 @@ avg_ratej_text= html.Div(html.H1('Avg Jucas Rating',className= 'info-header',
                             style=dict(display='', marginLeft='', textAlign="center", width='100%'))
 
 # initializing an empty figure where it will contain the Avg Jucas Rating info ( number )
-avg_ratej_fig=go.Figure()
+avg_ratej_fig=initial_figures[2]
 avg_ratej_indicator=html.Div(dcc.Graph(figure=avg_ratej_fig,config={'displayModeBar': False},id='avg_ratej_indicator',style=dict(width='100%')),className='num'
                            , style=dict(width='100%')  )
 
@@ -163,7 +262,7 @@ avg_rateb_text= html.Div(html.H1('Avg Bank Rating',className= 'info-header',
                                                marginTop='')),
                             style=dict(display='', marginLeft='', textAlign="center", width='100%'))
 
-avg_rateb_fig=go.Figure()
+avg_rateb_fig=initial_figures[3]
 
 avg_rateb_indicator=html.Div(dcc.Graph(figure=avg_rateb_fig,config={'displayModeBar': False},id='avg_rateb_indicator',style=dict(width='100%')),className='num'
                            , style=dict(width='100%')  )
@@ -174,7 +273,7 @@ avg_time_text= html.Div(html.H1('Avg Amortization Time',className= 'info-header'
                                                marginTop='')),
                             style=dict(display='', marginLeft='', textAlign="center", width='100%'))
 
-avg_time_fig=go.Figure()
+avg_time_fig=initial_figures[4]
 
 avg_time_indicator=html.Div(dcc.Graph(figure=avg_time_fig,config={'displayModeBar': False},id='avg_time_indicator',style=dict(width='100%')),className='num'
                            , style=dict(width='100%')  )
@@ -185,7 +284,7 @@ to_be_paid_text= html.Div(html.H1('To be Paid Sum',className= 'info-header',
                                                marginTop='')),
                             style=dict(display='', marginLeft='', textAlign="center", width='100%'))
 
-to_be_paid_fig=go.Figure()
+to_be_paid_fig=initial_figures[5]
 
 to_be_paid_indicator=html.Div(dcc.Graph(figure=to_be_paid_fig,config={'displayModeBar': False},id='to_be_paid_indicator',style=dict(width='100%')),className='num'
                            , style=dict(width='100%')  )
@@ -195,7 +294,7 @@ op_count_text= html.Div(html.H1('Operations Count',className= 'info-header',
                                                marginTop='')),
                             style=dict(display='', marginLeft='', textAlign="center", width='100%'))
 
-op_count_fig=go.Figure()
+op_count_fig=initial_figures[6]
 
 op_count_indicator=html.Div(dcc.Graph(figure=op_count_fig,config={'displayModeBar': False},id='op_count_indicator',style=dict(width='100%')),className='num'
                            , style=dict(width='100%')  )
@@ -208,9 +307,14 @@ dropdowns_border='#BEBEBE'
 dropdowns_width='16%'
 
 # creating customer_id dropdown menu
+if customer_search_on_server:
+    customer_id_options=[Functions.get_customer_option(initial_customer,dataset.get_customer_name(initial_customer))]
+else:
+    customer_id_options=[{'label': id , 'value': id} for id in customers_ids_list]
+
 customer_id_menu = dcc.Dropdown(
-    options=[{'label': id , 'value': id} for id in customers_ids_list],
-    value=df['customer_id'][14],
+    options=customer_id_options,
+    value=initial_customer,
     id='customer_id_menu',
     style=dict(color=dropdowns_font, fontWeight='bold', textAlign='center',borderRadius=dropdowns_bg_radius,
                width='100%', backgroundColor=dropdowns_bg, border='1px solid {}'.format(dropdowns_border) )
@@ -330,11 +434,20 @@ customer_name_col=dbc.Col(  html.Div(dbc.Card(dbc.CardBody([customer_name_div
 # creating the download excel section
 download_excel=html.Div([Download(id="download_excel")])
 
+# with the streaming export the button is a link to the /export route of the customer , set when the filters are applied
 download_excel_button = html.Div(dbc.Button(
-    "Download Excel", id="download_excel_button", n_clicks=0, size='lg',
+    "Download" if export_streaming else "Download Excel", id="download_excel_button", n_clicks=0, size='lg',
+    external_link=True, disabled=export_streaming,
     style=dict(fontSize='1.4vh', backgroundColor='#119DFF',color='white',fontWeight='bold')
 ), style=dict(textAlign='center', display='', marginTop='1.5%', paddingLeft='',width=''))
 
+# the formats the customer data can be downloaded in , only shown with the streaming export
+export_format_menu = html.Div(dcc.RadioItems(id='export_format',
+                                             options=[{'label': ' ' + name, 'value': name} for name in Database.get_export_formats()],
+                                             value='xlsx', inline=True, inputStyle=dict(marginLeft='0.6vw')),
+                              style=dict(textAlign='center', fontSize='1.3vh', marginTop='1vh',
+                                         display='' if export_streaming else 'none'))
+
 download_excel_text = html.Div(html.H1('Download Customer Data',
                               style=dict(fontSize='1.6vh', fontWeight='bold', color='black',
                                          marginTop='')),
@@ -342,7 +455,7 @@ download_excel_text = html.Div(html.H1('Download Customer Data',
 
 excel_output=html.Div(id='excel_output')
 
-download_excel_div = html.Div([download_excel_text,download_excel_button,download_excel,excel_output],
+download_excel_div = html.Div([download_excel_text,export_format_menu,download_excel_button,download_excel,excel_output],
                        style={'width': '100%'})
 download_excel_row=html.Div(download_excel_div,style=dict(display= 'flex', alignItems= 'center',
                                                         justifyContent= 'center',width='100%'))
@@ -359,7 +472,8 @@ download_excel_col=dbc.Col( dbc.Card(dbc.CardBody([download_excel_row
 
 # creating the section of the histogram graph
 hist_fig=go.Figure(go.Histogram())
-hist_div=html.Div(id='operations_hist_div')
+hist_div=html.Div(Functions.get_operations_hist(initial_slice,hist_server_bins,hist_max_bins) if figure_patch_updates else None,
+                  id='operations_hist_div')
 
 hist_div_col=dbc.Col( dbc.Card(dbc.CardBody([ html.Div([dbc.Spinner([hist_div],size="lg", color="primary", type="border", fullscreen=False )
 
@@ -399,9 +513,16 @@ resolution_menu_div = html.Div([resolution_menu],
 resolution_menu_row=html.Div([resolution_menu_div],style=dict(display='flex', alignItems='center',
                                       justifyContent='center', width='100%'))
 
-line_chart_div = html.Div(id='line_chart_div')
+line_chart_div = html.Div(Functions.get_line_chart(Functions.get_line_chart_data(
+    dataset.get_line_chart_pyramid(*initial_filters),'Sum Monthly'))[0] if figure_patch_updates else None,id='line_chart_div')
+
+# the daily sums of the line chart used by the clientside resolution change
+line_chart_series=dcc.Store(id='line_chart_series')
+
+# the width of the line chart in pixels used to downsample its traces
+line_chart_width=dcc.Store(id='line_chart_width')
 
-line_chart_col= dbc.Col([dbc.Card(dbc.CardBody([
+line_chart_col= dbc.Col([dbc.Card(dbc.CardBody([line_chart_series,line_chart_width,
                                                 dbc.Spinner([line_chart_div], size="lg", color="primary", type="border",
                                                                     fullscreen=False) , html.Br(),resolution_menu_row
 
@@ -413,7 +534,8 @@ line_chart_col= dbc.Col([dbc.Card(dbc.CardBody([
                                 style=dict(paddingLeft='0.5vw',paddingRight='0.5vw'))
 
 # creating the section of the stacked bar chart
-stacked_bar_chart_div=html.Div(id='stacked_bar_chart_div')
+stacked_bar_chart_div=html.Div(Functions.get_stacked_bar_chart(initial_slice,dataset.get_bank_sector_counts(*initial_filters))
+                               if figure_patch_updates else None,id='stacked_bar_chart_div')
 stacked_bar_chart_col=dbc.Col( dbc.Card(dbc.CardBody([ html.Div([dbc.Spinner([stacked_bar_chart_div]
                                                     ,size="lg", color="primary", type="border", fullscreen=False )
 
@@ -436,12 +558,20 @@ download_pdf_button = html.Div(dbc.Button(
 pdf_output=dbc.Spinner([dbc.Alert("Downloaded Succesfully",id="pdf_output",is_open=False,duration=4000,style=dict(marginTop='2vh'))]
                        , size="sm", color="primary",type="border", fullscreen=False,spinner_style=dict(marginTop=''))
 
-pdf_div=html.Div([download_pdf_button,pdf_output])
+# the progress of the pdf report shown while it is generated in background , and the component sending it to the browser
+pdf_progress=dbc.Progress(id='pdf_progress',value=0,max=1,striped=True,animated=True,
+                          style=dict(display='none',marginTop='1vh'))
+download_pdf=Download(id='download_pdf')
+
+pdf_div=html.Div([download_pdf_button,pdf_progress,download_pdf,pdf_output])
 pdf_row=html.Div(pdf_div,style=dict(display= 'flex', alignItems= 'center',
                                                         justifyContent= 'center',width='100%'))
 
 customer_table_div=html.Div(id='customer_table_div')
-customer_table_col=dbc.Col( dbc.Card(dbc.CardBody([ html.Div([dbc.Spinner([customer_table_div]
+
+# the filters values used by the table shown , the table pages and the pdf report are taken from them
+table_filters=dcc.Store(id='table_filters')
+customer_table_col=dbc.Col( dbc.Card(dbc.CardBody([ table_filters,html.Div([dbc.Spinner([customer_table_div]
                                                     ,size="lg", color="primary", type="border", fullscreen=False )
 
 
@@ -559,62 +689,116 @@ dbc.Row([
 -------- Backend Part --------
 '''
 
-# this function is responsible for downloading a pdf report with all the needed informations from dashboard when the pdf button is pressed
-@app.callback(
-    Output("pdf_output", "is_open"),
-    [Input("download_pdf_button", "n_clicks")],
-    [State("pdf_output", "is_open"),State('customer_table','data')
-    ,State('customer_name_text','children'),State('sum_trans_indicator','figure'),State('sum_dep_indicator','figure'),
-     State('avg_ratej_indicator','figure'),State('avg_rateb_indicator','figure'),State('avg_time_indicator','figure'),
-     State('to_be_paid_indicator','figure'),State('op_count_indicator','figure')],
-    prevent_initial_call=True)
-def download_pdf(n, is_open,data,customer_name,trans_indicator,dep_indicator,ratej_indicator,rateb_indicator,
+# registering a callback only when enabled is True , used for the callbacks that depend on the options on the top of the file
+def optional_callback(enabled,*args,**kwargs):
+    if not enabled:
+        return lambda func: func
+    return app.callback(*args,**kwargs)
+
+# the number of points of every line chart trace , None when the traces are not downsampled
+def get_line_chart_points(chart_width):
+    if not line_chart_downsampling:
+        return None
+    return int(chart_width or line_chart_default_width)
+
+# the output of a chart card , the figure of the chart when the figures are patched or the children of its div when
+# the chart is built again
+def chart_output(graph_id,div_id):
+    return Output(graph_id,'figure') if figure_patch_updates else Output(div_id,'children')
+
+# the threads used by the single Apply callback to build the cards figures at the same time
+cards_executor=ThreadPoolExecutor(max_workers=5)
+
+# this function returns the customer of the table , the table_filters store carries it since the filters were applied ,
+# otherwise it is found from the ide of a row of the table with the dataset ide index
+def get_table_customer(dataset,filters,ide):
+    if filters and dataset.has_customer(filters.get('customer')):
+        return filters['customer']
+    return dataset.get_ide_customer(ide)
+
+# this function is responsible for downloading a pdf report with all the needed informations from dashboard when the pdf button is pressed ,
+# set_progress is given by the background callback to show the progress ( None when it is not generated in background )
+def generate_pdf_download(set_progress,n, is_open,data,filters,customer_name,trans_indicator,dep_indicator,ratej_indicator,rateb_indicator,
                  time_indicator,be_paid_indicator,operation_count_indicator):
+    dataset=Database.get_dataset()
 
     # getting the information needed from the dashboard info cards
-    transactions_value=str(trans_indicator['data'][0]['value']) + ' R$'
-    deposits_value=str(dep_indicator['data'][0]['value']) + ' R$'
-    ratej_value=str( round(ratej_indicator['data'][0]['value'],1) )
-    rateb_value=str( round(rateb_indicator['data'][0]['value'],1) )
-    time_value=str(time_indicator['data'][0]['value']) + ' Months'
-    be_paid_value=str(be_paid_indicator['data'][0]['value']) + ' R$'
-    operations_value=str(operation_count_indicator['data'][0]['value'])
-
-    # converting the table in the dashboard to a dataframe to be used in pdf file
-    df_customer=pd.DataFrame(data)
-    customer_id=df[df['ide']==df_customer['ide'][0]]['customer_id'].values[0]
+    report_texts=Functions.get_pdf_report_texts(dict(
+        trans_value=trans_indicator['data'][0]['value'],dep_value=dep_indicator['data'][0]['value'],
+        ratej_value=ratej_indicator['data'][0]['value'],rateb_value=rateb_indicator['data'][0]['value'],
+        time_amor_value=time_indicator['data'][0]['value'],to_be_paid_value=be_paid_indicator['data'][0]['value'],
+        op_count_value=operation_count_indicator['data'][0]['value']))
+
+    # converting the table in the dashboard to a dataframe to be used in pdf file , with the custom paging the table
+    # only has the page shown so all the rows are taken from the dataset using the filters of the table
+    if table_custom_paging:
+        df_customer=Functions.get_table_frame(dataset.get_slice(filters['customer'],filters['bank'],
+                                                                filters['sector'],filters['year'])).reset_index(drop=True)
+    else:
+        df_customer=pd.DataFrame(data)
+    customer_id=get_table_customer(dataset,filters,df_customer['ide'].iloc[0] if len(df_customer) else None)
 
     # creating a pdf file object
     pdf = FPDF(format='letter', unit='in')
 
     # calling the function ( in Functions.py) that use all the gathered info to generate the pdf file
-    Functions.generate_pdf_report(df_customer,pdf,customer_name,customer_id,
-                                  transactions_value,deposits_value,ratej_value,rateb_value,time_value,be_paid_value,operations_value)
+    progress = (lambda done,total: set_progress((done,total))) if set_progress is not None else None
+    pdf_content=Functions.generate_pdf_report(df_customer,pdf,customer_name,customer_id,*report_texts,progress=progress)
 
-    # returning a massage that confirms that the download was done succesfully
-    return not is_open
+    # sending the pdf file to the browser and returning a massage that confirms that the download was done succesfully
+    return dcc.send_bytes(pdf_content,'{}.pdf'.format(customer_id)),not is_open
+
+
+# the outputs , inputs and states of the pdf report callback
+pdf_callback_args=dict(
+    output=[Output('download_pdf','data'),Output("pdf_output", "is_open")],
+    inputs=[Input("download_pdf_button", "n_clicks")],
+    state=[State("pdf_output", "is_open"),State('customer_table','data'),State('table_filters','data')
+    ,State('customer_name_text','children'),State('sum_trans_indicator','figure'),State('sum_dep_indicator','figure'),
+     State('avg_ratej_indicator','figure'),State('avg_rateb_indicator','figure'),State('avg_time_indicator','figure'),
+     State('to_be_paid_indicator','figure'),State('op_count_indicator','figure')],
+    prevent_initial_call=True)
+
+if background_manager is not None:
+    # the button is disabled and the progress bar is shown while the report is generated
+    app.callback(**pdf_callback_args,background=True,manager=background_manager,
+                 running=[(Output('download_pdf_button','disabled'),True,False),
+                          (Output('pdf_progress','style'),dict(display='',marginTop='1vh'),dict(display='none',marginTop='1vh'))],
+                 progress=[Output('pdf_progress','value'),Output('pdf_progress','max')])(generate_pdf_download)
+else:
+    @app.callback(**pdf_callback_args)
+    def download_pdf_now(*args):
+        return generate_pdf_download(None,*args)
 
 
 # this function is responsible for downloading an excel file which contains all the original data filtered by only the customer id chosen
-@app.callback(Output('download_excel', 'data'),
-              Input('download_excel_button', 'n_clicks'),State('customer_table','data')
+@optional_callback(not export_streaming,Output('download_excel', 'data'),
+              Input('download_excel_button', 'n_clicks'),[State('customer_table','data'),State('table_filters','data')]
 
     ,prevent_initial_call=True)
-def download_customer_data(clicks,data):
-    # using the table in the dashboard to know which customer id was chosen
-    temp_df=pd.DataFrame(data)
-    selected_customer = df[df['ide'] == temp_df['ide'][0]]['customer_id'].values[0]
+def download_customer_data(clicks,data,filters):
+    dataset=Database.get_dataset()
+    # using the filters applied to the table ( or the first row of the table ) to know which customer id was chosen
+    selected_customer = get_table_customer(dataset,filters,data[0]['ide'] if data else None)
 
-    # filtering the original dataframe based on the chosen customer id
-    df_customer = dff[dff['customer_id'] == int(selected_customer)]
-    df_customer['customer_id']=df_customer['customer_id'].astype(str)
+    # reading the original rows ( all the excel columns ) of the chosen customer id
+    df_customer = Database.get_customer_export_rows(excel_file,selected_customer)
 
     # sending the dataframe to the download component that handles the downloading process from the browser
     return send_data_frame(df_customer.to_excel, "{}.xlsx".format(selected_customer))
 
 
+# this function points the download button to the export of the customer of the applied filters in the chosen format
+@optional_callback(export_streaming,[Output('download_excel_button','href'),Output('download_excel_button','disabled')],
+              [Input('table_filters','data'),Input('export_format','value')])
+def update_export_link(filters,export_format):
+    if not filters:
+        return None,True
+    return '/export/{}.{}'.format(filters['customer'],export_format),False
+
+
 # this function is responsible for creating the table on the dashboard based on all filters chosen
-@app.callback(Output('customer_table_div','children'),
+@optional_callback(not single_apply_callback,[Output('customer_table_div','children'),Output('table_filters','data')],
               Input('apply_button','n_clicks'),
               [State('customer_id_menu','value'),State('banks_names_menu','value'),State('sectors_names_menu','value'),
                State('years_menu','value')]
@@ -624,195 +808,244 @@ def update_table_card(clicks,selected_customer,selected_bank,selected_sector,sel
     -------- Important --------
 
     all the functions starting from this one and all the bellow functions are triggered when the button called ( Apply Filters )
-    is pressed and then we have 8 conditions to check for the filters values and the original
-    dataframe is filtered depending on the existing condition , this filtering logic is repeated in all functions bellow
-    and after the filtering happens the function that created the corresponding graph is called from ( Functions.py )
-    '''
-
-
-    if selected_sector=='All Sectors' and selected_bank=='All Banks' and selected_year=='All Years':
-        df_customer = df[df['customer_id'] == selected_customer]
+    is pressed and then the rows matching the filters values are taken from the dataset filter index ( Database.py ) ,
+    the 'All ...' values match everything , and after the filtering happens the function that created the
+    corresponding graph is called from ( Functions.py ) .
 
-    elif selected_sector=='All Sectors' and selected_bank!='All Banks' and selected_year!='All Years':
-        df_customer = df[(df['customer_id'] == selected_customer) & (df['bank_name'] == selected_bank) & (df['Year'] == selected_year)]
-
-    elif selected_sector=='All Sectors' and selected_bank=='All Banks' and selected_year!='All Years':
-        df_customer = df[(df['customer_id'] == selected_customer) & (df['Year'] == selected_year)]
-
-    elif selected_sector=='All Sectors' and selected_bank!='All Banks' and selected_year=='All Years':
-        df_customer = df[(df['customer_id'] == selected_customer) & (df['bank_name'] == selected_bank) ]
-
-    elif selected_sector!='All Sectors' and selected_bank=='All Banks' and selected_year=='All Years':
-        df_customer = df[(df['customer_id'] == selected_customer) & (df['sector_name4'] == selected_sector)]
+    every callback takes the current dataset once at its start , so it keeps working on the same version of the
+    database even if the database is reloaded while it runs
+    '''
+    dataset=Database.get_dataset()
 
+    # taking the rows matching the 4 dropdowns values from the dataset filter index ( cached , it is the same for all cards )
+    df_customer = dataset.get_slice(selected_customer,selected_bank,selected_sector,selected_year)
 
-    elif selected_sector!='All Sectors' and selected_bank=='All Banks' and selected_year!='All Years':
-        df_customer = df[(df['customer_id'] == selected_customer) & (df['Year'] == selected_year) & (df['sector_name4'] == selected_sector)]
+    return (Functions.get_customer_table(df_customer,table_custom_paging),
+            dict(customer=selected_customer,bank=selected_bank,sector=selected_sector,year=selected_year))
 
-    elif selected_sector != 'All Sectors' and selected_bank != 'All Banks' and selected_year == 'All Years':
-        df_customer = df[(df['customer_id'] == selected_customer) & (df['bank_name'] == selected_bank) & (df['sector_name4'] == selected_sector)]
 
-    else:
-        df_customer = df[(df['customer_id'] == selected_customer) & (df['bank_name'] == selected_bank) & (df['sector_name4'] == selected_sector) & (df['Year'] == selected_year)]
+# this function sends the rows of the table page shown when the page , the sorting or the filter of the table change
+@optional_callback(table_custom_paging,[Output('customer_table','data'),Output('customer_table','page_count')],
+              [Input('customer_table','page_current'),Input('customer_table','page_size'),
+               Input('customer_table','sort_by'),Input('customer_table','filter_query')],
+              State('table_filters','data')
+            ,prevent_initial_call=True)
+def update_table_page(page_current,page_size,sort_by,filter_query,filters):
+    dataset=Database.get_dataset()
+    if not filters:
+        raise PreventUpdate
 
-    return Functions.get_customer_table(df_customer)
+    df_customer = dataset.get_slice(filters['customer'],filters['bank'],filters['sector'],filters['year'])
+    return Functions.get_customer_table_page(df_customer,page_current,page_size,sort_by,filter_query)
 
 
-@app.callback(Output('stacked_bar_chart_div','children'),
+@optional_callback(not single_apply_callback,chart_output('stacked_bar_chart','stacked_bar_chart_div'),
               Input('apply_button','n_clicks'),
               [State('customer_id_menu','value'),State('banks_names_menu','value'),State('sectors_names_menu','value'),
                State('years_menu','value')]
             )
 def update_stacked_bar_card(clicks,selected_customer,selected_bank,selected_sector,selected_year):
-    if selected_sector=='All Sectors' and selected_bank=='All Banks' and selected_year=='All Years':
-        df_customer = df[df['customer_id'] == selected_customer]
-
-    elif selected_sector=='All Sectors' and selected_bank!='All Banks' and selected_year!='All Years':
-        df_customer = df[(df['customer_id'] == selected_customer) & (df['bank_name'] == selected_bank) & (df['Year'] == selected_year)]
-
-    elif selected_sector=='All Sectors' and selected_bank=='All Banks' and selected_year!='All Years':
-        df_customer = df[(df['customer_id'] == selected_customer) & (df['Year'] == selected_year)]
-
-    elif selected_sector=='All Sectors' and selected_bank!='All Banks' and selected_year=='All Years':
-        df_customer = df[(df['customer_id'] == selected_customer) & (df['bank_name'] == selected_bank) ]
+    dataset=Database.get_dataset()
+    # taking the rows matching the 4 dropdowns values from the dataset filter index ( cached , it is the same for all cards )
+    df_customer = dataset.get_slice(selected_customer,selected_bank,selected_sector,selected_year)
 
-    elif selected_sector!='All Sectors' and selected_bank=='All Banks' and selected_year=='All Years':
-        df_customer = df[(df['customer_id'] == selected_customer) & (df['sector_name4'] == selected_sector)]
+    bank_sector_counts = dataset.get_bank_sector_counts(selected_customer,selected_bank,selected_sector,selected_year)
 
+    if figure_patch_updates:
+        return Functions.get_stacked_bar_patch(bank_sector_counts)
+    return Functions.get_stacked_bar_chart(df_customer,bank_sector_counts)
 
-    elif selected_sector!='All Sectors' and selected_bank=='All Banks' and selected_year!='All Years':
-        df_customer = df[(df['customer_id'] == selected_customer) & (df['Year'] == selected_year) & (df['sector_name4'] == selected_sector)]
 
-    elif selected_sector != 'All Sectors' and selected_bank != 'All Banks' and selected_year == 'All Years':
-        df_customer = df[(df['customer_id'] == selected_customer) & (df['bank_name'] == selected_bank) & (df['sector_name4'] == selected_sector)]
-
-    else:
-        df_customer = df[(df['customer_id'] == selected_customer) & (df['bank_name'] == selected_bank) & (df['sector_name4'] == selected_sector) & (df['Year'] == selected_year)]
-
-    return Functions.get_stacked_bar_chart(df_customer)
-
-
-@app.callback(Output('line_chart','figure'),
+@optional_callback(not line_chart_clientside,Output('line_chart','figure',allow_duplicate=True),
               Input('resolution_menu','value'),
               [State('customer_id_menu','value'),State('banks_names_menu','value'),
-               State('sectors_names_menu','value'),State('years_menu','value')]
+               State('sectors_names_menu','value'),State('years_menu','value'),State('line_chart_width','data')]
             ,prevent_initial_call=True)
-def update_line_figure(selected_resolution,selected_customer,selected_bank,selected_sector,selected_year):
-    if selected_sector=='All Sectors' and selected_bank=='All Banks' and selected_year=='All Years':
-        df_customer = df[df['customer_id'] == selected_customer]
-
-    elif selected_sector=='All Sectors' and selected_bank!='All Banks' and selected_year!='All Years':
-        df_customer = df[(df['customer_id'] == selected_customer) & (df['bank_name'] == selected_bank) & (df['Year'] == selected_year)]
-
-    elif selected_sector=='All Sectors' and selected_bank=='All Banks' and selected_year!='All Years':
-        df_customer = df[(df['customer_id'] == selected_customer) & (df['Year'] == selected_year)]
-
-    elif selected_sector=='All Sectors' and selected_bank!='All Banks' and selected_year=='All Years':
-        df_customer = df[(df['customer_id'] == selected_customer) & (df['bank_name'] == selected_bank) ]
-
-    elif selected_sector!='All Sectors' and selected_bank=='All Banks' and selected_year=='All Years':
-        df_customer = df[(df['customer_id'] == selected_customer) & (df['sector_name4'] == selected_sector)]
+def update_line_figure(selected_resolution,selected_customer,selected_bank,selected_sector,selected_year,chart_width=None):
+    dataset=Database.get_dataset()
+    # taking the line chart sums of the slice at all the resolutions ( cached , switching the resolution is only a lookup )
+    pyramid = dataset.get_line_chart_pyramid(selected_customer,selected_bank,selected_sector,selected_year)
+
+    graph_data = Functions.get_line_chart_data(pyramid,selected_resolution)
+    if figure_patch_updates:
+        return Functions.get_line_chart_patch(graph_data,get_line_chart_points(chart_width))
+    return Functions.get_line_chart(graph_data,get_line_chart_points(chart_width))[1]
+
+
+# this function sends the line chart points of the zoomed range again , downsampled to the chart width like the
+# whole chart ( so there are more details when zooming in )
+@optional_callback(line_chart_downsampling,Output('line_chart','figure',allow_duplicate=True),
+              Input('line_chart','relayoutData'),
+              [State('table_filters','data'),State('resolution_menu','value'),State('line_chart_width','data')]
+            ,prevent_initial_call=True)
+def update_line_zoom(relayout_data,filters,selected_resolution,chart_width):
+    date_range,unchanged=Functions.get_relayout_x_range(relayout_data)
+    if unchanged or not filters:
+        raise PreventUpdate
 
+    dataset=Database.get_dataset()
+    pyramid = dataset.get_line_chart_pyramid(filters['customer'],filters['bank'],filters['sector'],filters['year'])
+    graph_data = Functions.get_line_chart_data(pyramid,selected_resolution)
+    if figure_patch_updates:
+        return Functions.get_line_chart_patch(graph_data,get_line_chart_points(chart_width),date_range)
+    return Functions.get_line_chart(graph_data,get_line_chart_points(chart_width),date_range)[1]
 
-    elif selected_sector!='All Sectors' and selected_bank=='All Banks' and selected_year!='All Years':
-        df_customer = df[(df['customer_id'] == selected_customer) & (df['Year'] == selected_year) & (df['sector_name4'] == selected_sector)]
 
-    elif selected_sector != 'All Sectors' and selected_bank != 'All Banks' and selected_year == 'All Years':
-        df_customer = df[(df['customer_id'] == selected_customer) & (df['bank_name'] == selected_bank) & (df['sector_name4'] == selected_sector)]
+# keeping the width of the line chart in the browser , the chart sends a relayoutData when it is drawn or resized
+if line_chart_downsampling:
+    app.clientside_callback(ClientsideFunction(namespace='line_chart',function_name='get_width'),
+                            Output('line_chart_width','data'),
+                            Input('line_chart','relayoutData')
+                            ,prevent_initial_call=True)
 
-    else:
-        df_customer = df[(df['customer_id'] == selected_customer) & (df['bank_name'] == selected_bank) & (df['sector_name4'] == selected_sector) & (df['Year'] == selected_year)]
 
-    return Functions.get_line_chart(df_customer,selected_resolution)[1]
+# the same as update_line_figure but done in the browser from the daily sums sent with the chart
+if line_chart_clientside:
+    app.clientside_callback(ClientsideFunction(namespace='line_chart',function_name='update_resolution'),
+                            Output('line_chart','figure',allow_duplicate=True),
+                            [Input('resolution_menu','value'),Input('line_chart_series','data')],
+                            State('line_chart','figure')
+                            ,prevent_initial_call=True)
 
 
-@app.callback(Output('line_chart_div','children'),
+@optional_callback(not single_apply_callback,[chart_output('line_chart','line_chart_div'),Output('line_chart_series','data')],
               Input('apply_button','n_clicks'),
               [State('customer_id_menu','value'),State('banks_names_menu','value'),
-               State('sectors_names_menu','value'),State('years_menu','value'),State('resolution_menu','value')]
+               State('sectors_names_menu','value'),State('years_menu','value'),State('resolution_menu','value'),
+               State('line_chart_width','data')]
             )
-def update_line_div(clicks,selected_customer,selected_bank,selected_sector,selected_year,selected_resolution):
-    if selected_sector=='All Sectors' and selected_bank=='All Banks' and selected_year=='All Years':
-        df_customer = df[df['customer_id'] == selected_customer]
-
-    elif selected_sector=='All Sectors' and selected_bank!='All Banks' and selected_year!='All Years':
-        df_customer = df[(df['customer_id'] == selected_customer) & (df['bank_name'] == selected_bank) & (df['Year'] == selected_year)]
-
-    elif selected_sector=='All Sectors' and selected_bank=='All Banks' and selected_year!='All Years':
-        df_customer = df[(df['customer_id'] == selected_customer) & (df['Year'] == selected_year)]
-
-    elif selected_sector=='All Sectors' and selected_bank!='All Banks' and selected_year=='All Years':
-        df_customer = df[(df['customer_id'] == selected_customer) & (df['bank_name'] == selected_bank) ]
-
-    elif selected_sector!='All Sectors' and selected_bank=='All Banks' and selected_year=='All Years':
-        df_customer = df[(df['customer_id'] == selected_customer) & (df['sector_name4'] == selected_sector)]
-
+def update_line_div(clicks,selected_customer,selected_bank,selected_sector,selected_year,selected_resolution,chart_width=None):
+    dataset=Database.get_dataset()
+    # taking the line chart sums of the slice at all the resolutions ( cached , switching the resolution is only a lookup )
+    pyramid = dataset.get_line_chart_pyramid(selected_customer,selected_bank,selected_sector,selected_year)
 
-    elif selected_sector!='All Sectors' and selected_bank=='All Banks' and selected_year!='All Years':
-        df_customer = df[(df['customer_id'] == selected_customer) & (df['Year'] == selected_year) & (df['sector_name4'] == selected_sector)]
+    line_chart_series = Functions.get_line_chart_series(pyramid) if line_chart_clientside else None
 
-    elif selected_sector != 'All Sectors' and selected_bank != 'All Banks' and selected_year == 'All Years':
-        df_customer = df[(df['customer_id'] == selected_customer) & (df['bank_name'] == selected_bank) & (df['sector_name4'] == selected_sector)]
+    graph_data = Functions.get_line_chart_data(pyramid,selected_resolution)
+    if figure_patch_updates:
+        return Functions.get_line_chart_patch(graph_data,get_line_chart_points(chart_width)),line_chart_series
+    return Functions.get_line_chart(graph_data,get_line_chart_points(chart_width))[0],line_chart_series
 
-    else:
-        df_customer = df[(df['customer_id'] == selected_customer) & (df['bank_name'] == selected_bank) & (df['sector_name4'] == selected_sector) & (df['Year'] == selected_year)]
-
-    return Functions.get_line_chart(df_customer,selected_resolution)[0]
-
-@app.callback(Output('operations_hist_div','children'),
+@optional_callback(not single_apply_callback,chart_output('operations_hist','operations_hist_div'),
               Input('apply_button','n_clicks'),
               [State('customer_id_menu','value'),State('banks_names_menu','value'),State('sectors_names_menu','value'),
                State('years_menu','value')]
             )
 def update_hist_card(clicks,selected_customer,selected_bank,selected_sector,selected_year):
-    if selected_sector=='All Sectors' and selected_bank=='All Banks' and selected_year=='All Years':
-        df_customer = df[df['customer_id'] == selected_customer]
+    dataset=Database.get_dataset()
+    # taking the rows matching the 4 dropdowns values from the dataset filter index ( cached , it is the same for all cards )
+    df_customer = dataset.get_slice(selected_customer,selected_bank,selected_sector,selected_year)
 
-    elif selected_sector=='All Sectors' and selected_bank!='All Banks' and selected_year!='All Years':
-        df_customer = df[(df['customer_id'] == selected_customer) & (df['bank_name'] == selected_bank) & (df['Year'] == selected_year)]
+    if figure_patch_updates:
+        return Functions.get_operations_hist_patch(df_customer,hist_server_bins,max_bins=hist_max_bins)
+    return Functions.get_operations_hist(df_customer,hist_server_bins,hist_max_bins)
 
-    elif selected_sector=='All Sectors' and selected_bank=='All Banks' and selected_year!='All Years':
-        df_customer = df[(df['customer_id'] == selected_customer) & (df['Year'] == selected_year)]
 
-    elif selected_sector=='All Sectors' and selected_bank!='All Banks' and selected_year=='All Years':
-        df_customer = df[(df['customer_id'] == selected_customer) & (df['bank_name'] == selected_bank) ]
+# this function counts the dates of the zoomed range of the histogram again at a smaller bin width
+@optional_callback(hist_server_bins,Output('operations_hist','figure',allow_duplicate=True),
+              Input('operations_hist','relayoutData'),State('table_filters','data')
+            ,prevent_initial_call=True)
+def update_hist_zoom(relayout_data,filters):
+    date_range,unchanged=Functions.get_relayout_x_range(relayout_data)
+    if unchanged or not filters:
+        raise PreventUpdate
 
-    elif selected_sector!='All Sectors' and selected_bank=='All Banks' and selected_year=='All Years':
-        df_customer = df[(df['customer_id'] == selected_customer) & (df['sector_name4'] == selected_sector)]
+    dataset=Database.get_dataset()
+    df_customer = dataset.get_slice(filters['customer'],filters['bank'],filters['sector'],filters['year'])
+    if figure_patch_updates:
+        return Functions.get_operations_hist_patch(df_customer,True,date_range,hist_max_bins)
+    return Functions.get_operations_hist_figure(df_customer,True,date_range,hist_max_bins)
 
 
-    elif selected_sector!='All Sectors' and selected_bank=='All Banks' and selected_year!='All Years':
-        df_customer = df[(df['customer_id'] == selected_customer) & (df['Year'] == selected_year) & (df['sector_name4'] == selected_sector)]
 
-    elif selected_sector != 'All Sectors' and selected_bank != 'All Banks' and selected_year == 'All Years':
-        df_customer = df[(df['customer_id'] == selected_customer) & (df['bank_name'] == selected_bank) & (df['sector_name4'] == selected_sector)]
 
+@optional_callback(not single_apply_callback,[Output('sum_trans_indicator','figure'),Output('sum_dep_indicator','figure'),
+               Output('avg_ratej_indicator','figure'),Output('avg_rateb_indicator','figure'),
+               Output('avg_time_indicator','figure'),Output('to_be_paid_indicator','figure'),Output('op_count_indicator','figure'),
+               Output('customer_name_text','children')],
+              Input('apply_button','n_clicks'),
+              [State('customer_id_menu','value'),State('banks_names_menu','value'),State('sectors_names_menu','value'),
+               State('years_menu','value')]
+            )
+def update_indicators(clicks,selected_customer,selected_bank,selected_sector,selected_year):
+    dataset=Database.get_dataset()
+
+    # the cards values are taken from the dataset cube , no rows are filtered here
+    indicators_values = dataset.get_indicators(selected_customer,selected_bank,selected_sector,selected_year)
+    customer_name=dataset.get_customer_name(selected_customer)
+    if figure_patch_updates:
+        indicators_figures=Functions.get_indicators_patches(indicators_values)
     else:
-        df_customer = df[(df['customer_id'] == selected_customer) & (df['bank_name'] == selected_bank) & (df['sector_name4'] == selected_sector) & (df['Year'] == selected_year)]
+        indicators_figures=Functions.get_indicators_figures(indicators_values)
+    sum_trans_fig, sum_dep_fig, avg_ratej_fig, avg_rateb_fig, avg_time_fig, to_be_paid_fig, op_count_fig=indicators_figures
 
-    return Functions.get_operations_hist(df_customer)
 
 
+    return (sum_trans_fig,sum_dep_fig,avg_ratej_fig,avg_rateb_fig,avg_time_fig,to_be_paid_fig,op_count_fig,customer_name)
+
 
 
-@app.callback([Output('sum_trans_indicator','figure'),Output('sum_dep_indicator','figure'),
+# this function replaces all the Apply Filters callbacks above when single_apply_callback is True ,
+# the rows are filtered once and every card is built on its own thread , then all of them are sent in one response
+@optional_callback(single_apply_callback,
+              [Output('customer_table_div','children'),Output('table_filters','data'),
+               chart_output('stacked_bar_chart','stacked_bar_chart_div'),chart_output('line_chart','line_chart_div'),
+               Output('line_chart_series','data'),chart_output('operations_hist','operations_hist_div'),
+               Output('sum_trans_indicator','figure'),Output('sum_dep_indicator','figure'),
                Output('avg_ratej_indicator','figure'),Output('avg_rateb_indicator','figure'),
                Output('avg_time_indicator','figure'),Output('to_be_paid_indicator','figure'),Output('op_count_indicator','figure'),
                Output('customer_name_text','children')],
               Input('apply_button','n_clicks'),
               [State('customer_id_menu','value'),State('banks_names_menu','value'),State('sectors_names_menu','value'),
-               State('years_menu','value')]
+               State('years_menu','value'),State('resolution_menu','value'),State('line_chart_width','data')]
             )
-def update_indicators(clicks,selected_customer,selected_bank,selected_sector,selected_year):
+def update_all_cards(clicks,selected_customer,selected_bank,selected_sector,selected_year,selected_resolution,chart_width=None):
+    dataset=Database.get_dataset()
+    df_customer = dataset.get_slice(selected_customer,selected_bank,selected_sector,selected_year)
+    customer_name = dataset.get_customer_name(selected_customer)
+
+    bank_sector_counts = dataset.get_bank_sector_counts(selected_customer,selected_bank,selected_sector,selected_year)
+    pyramid = dataset.get_line_chart_pyramid(selected_customer,selected_bank,selected_sector,selected_year)
+    line_data = Functions.get_line_chart_data(pyramid,selected_resolution)
+    indicators_values = dataset.get_indicators(selected_customer,selected_bank,selected_sector,selected_year)
+
+    table_future = cards_executor.submit(Functions.get_customer_table,df_customer,table_custom_paging)
+    if figure_patch_updates:
+        stacked_bar_future = cards_executor.submit(Functions.get_stacked_bar_patch,bank_sector_counts)
+        line_future = cards_executor.submit(Functions.get_line_chart_patch,line_data,get_line_chart_points(chart_width))
+        hist_future = cards_executor.submit(Functions.get_operations_hist_patch,df_customer,hist_server_bins,None,hist_max_bins)
+        indicators_future = cards_executor.submit(Functions.get_indicators_patches,indicators_values)
+    else:
+        stacked_bar_future = cards_executor.submit(Functions.get_stacked_bar_chart,df_customer,bank_sector_counts)
+        line_future = cards_executor.submit(lambda: Functions.get_line_chart(line_data,get_line_chart_points(chart_width))[0])
+        hist_future = cards_executor.submit(Functions.get_operations_hist,df_customer,hist_server_bins,hist_max_bins)
+        indicators_future = cards_executor.submit(Functions.get_indicators_figures,indicators_values)
 
-    df_customer=df[df['customer_id'] == selected_customer]
-    customer_name=df_customer['customer_name'].values[0]
-    sum_trans_fig, sum_dep_fig, avg_ratej_fig, avg_rateb_fig, avg_time_fig, to_be_paid_fig, op_count_fig=Functions.get_indicators_figures(df_customer,selected_customer,selected_bank,selected_sector,selected_year)
+    table_filters = dict(customer=selected_customer,bank=selected_bank,sector=selected_sector,year=selected_year)
+    line_chart_series = Functions.get_line_chart_series(pyramid) if line_chart_clientside else None
 
+    return (table_future.result(),table_filters,stacked_bar_future.result(),line_future.result(),line_chart_series,
+            hist_future.result(),
+            *indicators_future.result(),customer_name)
 
 
-    return (sum_trans_fig,sum_dep_fig,avg_ratej_fig,avg_rateb_fig,avg_time_fig,to_be_paid_fig,op_count_fig,customer_name)
+# this function searches the customers ( by customer id or name ) while typing in the customer id dropdown
+@optional_callback(customer_search_on_server,Output('customer_id_menu','options'),
+              Input('customer_id_menu','search_value'),State('customer_id_menu','value')
+            ,prevent_initial_call=True)
+def update_customer_options(search_value,selected_customer):
+    dataset=Database.get_dataset()
+    if not search_value:
+        raise PreventUpdate
+
+    options=[Functions.get_customer_option(customer_id,customer_name)
+             for customer_id,customer_name in dataset.search_customers(search_value,customer_search_results)]
+
+    # keeping the selected customer in the options so the dropdown still shows it
+    if selected_customer and all(option['value']!=selected_customer for option in options):
+        options.append(Functions.get_customer_option(selected_customer,dataset.get_customer_name(selected_customer)))
 
+    return options
 
 
 # this function is responsible for changing the options in the different dropdowns menus depending on customer_id and other dropdowns values
@@ -821,20 +1054,16 @@ def update_indicators(clicks,selected_customer,selected_bank,selected_sector,sel
               [Input('customer_id_menu','value'),Input('banks_names_menu','value'),Input('sectors_names_menu','value')]
               ,prevent_initial_call=True)
 def update_dropdowns(selected_customer,selected_bank,selected_sector):
+    dataset=Database.get_dataset()
     ctx = dash.callback_context
     input_id = ctx.triggered[0]['prop_id'].split('.')[0]
 
+    # the banks , sectors and years lists come from the dataset facets ( built once when the database is loaded )
     if input_id == 'customer_id_menu':
-        customer_df = df[df['customer_id'] == selected_customer]
-
-        banks_list = list(customer_df['bank_name'].unique())
-        sectors_list = list(customer_df['sector_name4'].unique())
-        customer_df['Year'] = (pd.DatetimeIndex(customer_df['approval_date']).year).astype(str)
-        years = customer_df['Year'].to_list()
-        years = list(OrderedDict.fromkeys(years))
-        years.insert(0, 'All Years')
-        banks_list.insert(0, 'All Banks')
-        sectors_list.insert(0, 'All Sectors')
+        facets = dataset.get_facets(selected_customer)
+        banks_list = ['All Banks'] + facets['banks']
+        sectors_list = ['All Sectors'] + facets['sectors']
+        years = ['All Years'] + facets['years']
 
         return ([{'label': name, 'value': name} for name in banks_list] ,
                 [{'label': name, 'value': name} for name in sectors_list],
@@ -843,39 +1072,16 @@ def update_dropdowns(selected_customer,selected_bank,selected_sector):
 
 
     elif input_id == 'sectors_names_menu':
-        if selected_sector=='All Sectors':
-            customer_df = df[ df['customer_id'] == selected_customer]
-
-        else:
-            customer_df = df[ (df['customer_id'] == selected_customer) & (df['sector_name4'] == selected_sector)]
-
-        banks_list = list(customer_df['bank_name'].unique())
-        sectors_list = list(customer_df['sector_name4'].unique())
-        customer_df['Year'] = (pd.DatetimeIndex(customer_df['approval_date']).year).astype(str)
-        years = customer_df['Year'].to_list()
-        years = list(OrderedDict.fromkeys(years))
-        years.insert(0, 'All Years')
-        banks_list.insert(0, 'All Banks')
-        sectors_list.insert(0, 'All Sectors')
+        facets = dataset.get_facets(selected_customer,selected_sector)
+        banks_list = ['All Banks'] + facets['banks']
+        years = ['All Years'] + facets['years']
         return ([{'label': name, 'value': name} for name in banks_list] ,
                 dash.no_update,[{'label': year, 'value': year} for year in years],
                 banks_list[0] , dash.no_update, years[0] )
 
     elif input_id == 'banks_names_menu':
-        if selected_sector=='All Banks':
-            customer_df = df[ df['customer_id'] == selected_customer]
-
-        else:
-            customer_df = df[ (df['customer_id'] == selected_customer) & (df['sector_name4'] == selected_sector) & (df['bank_name'] == selected_bank)]
-
-        banks_list = list(customer_df['bank_name'].unique())
-        sectors_list = list(customer_df['sector_name4'].unique())
-        customer_df['Year'] = (pd.DatetimeIndex(customer_df['approval_date']).year).astype(str)
-        years = customer_df['Year'].to_list()
-        years = list(OrderedDict.fromkeys(years))
-        years.insert(0, 'All Years')
-        banks_list.insert(0, 'All Banks')
-        sectors_list.insert(0, 'All Sectors')
+        facets = dataset.get_facets(selected_customer,selected_sector,selected_bank)
+        years = ['All Years'] + facets['years']
         return (dash.no_update ,
                 dash.no_update,[{'label': year, 'value': year} for year in years],
                 dash.no_update , dash.no_update, years[0] )
@@ -883,6 +1089,48 @@ def update_dropdowns(selected_customer,selected_bank,selected_sector):
     else:
         raise PreventUpdate
 
+# this function tells if the request has the admin token , compared in constant time so the token can't be guessed
+# from the response times , always False when the token is not set
+def is_admin_request():
+    return bool(admin_token) and hmac.compare_digest(request.headers.get('X-Admin-Token', '').encode('utf-8'),
+                                                     admin_token.encode('utf-8'))
+
+
+# this route shows the hits , misses , evictions and memory used by the shared caches , it needs the admin token like
+# the /admin/reload route
+@server.route('/stats/cache')
+def cache_stats():
+    if not is_admin_request():
+        abort(403)
+    return jsonify(slice_cache=Database.slice_cache.stats(), series_cache=Database.series_cache.stats(),
+                   crosstab_cache=Database.crosstab_cache.stats())
+
+
+# this route sends all the original data of one customer as an excel , csv or parquet file , the file is sent in pieces
+# while it is written so only a chunk of rows is in memory at a time
+@server.route('/export/<customer_id>.<export_format>')
+def export_customer_data(customer_id,export_format):
+    export_formats=Database.get_export_formats()
+    if export_format not in export_formats or not Database.get_dataset().has_customer(customer_id):
+        abort(404)
+    return Response(Database.iter_customer_export(excel_file,customer_id,export_format,export_chunk_rows),
+                    mimetype=export_formats[export_format],
+                    headers={'Content-Disposition': 'attachment; filename={}.{}'.format(customer_id,export_format)})
+
+
+# this route reloads the database in the background , the callbacks keep using the current version until the new one is ready
+@server.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    if not is_admin_request():
+        abort(403)
+    Database.reload_in_background(excel_file)
+    return jsonify(version=Database.get_dataset().version), 202
+
+
+# watching the excel file to reload the database when it changes
+if database_watch_interval:
+    Database.start_watcher(excel_file,database_watch_interval)
+
 if __name__ == '__main__':
     app.run_server(host='localhost',port=8050,debug=False,dev_tools_silence_routes_logging=True)
 